@@ -1,13 +1,12 @@
+import hmac
 import re
 from datetime import datetime, timedelta
-from typing import Union
+from typing import List, Optional
 
-from decouple import config
-from fastapi import FastAPI, Depends
-from sqlalchemy import or_
+from decouple import config, Csv
+from fastapi import FastAPI, Depends, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
-from starlette.exceptions import HTTPException
 
 from authentication.auth_utils import (AuthHandler,
                                        send_email,
@@ -25,31 +24,86 @@ from authentication.error_responses import (UnIdenticalPasswordsException,
                                             ExpiredResetPasswordTokenException,
                                             InvalidResetPasswordTokenException,
                                             InvalidPhoneNumberException,
-                                            ActivationTextLimitException, UserExistsException,
+                                            ActivationTextLimitException,
                                             IncompleteFormException, )
 from authentication.schemas import (UserRegisterRequestModel,
                                     UserRegisterResponseModel,
                                     ResendEmailActivationRequestModel,
                                     ResetPasswordRequestModel,
                                     ResendPhoneActivationRequestModel, UserLoginRequestModel,
+                                    PhoneActivationRequestModel,
                                     UserLoginResponseModel, UserRefreshTokenRequestModel, UserRefreshTokenResponseModel,
                                     UpdateInfoRequestModel, UpdateInfoResponseModel, BaseMessage,
+                                    LoginThrottleStatsResponseModel, IdentifierIndexStatsResponseModel,
+                                    HashSchedulerStatsResponseModel, ProfileSummaryModel,
+                                    AdminUserModel, AdminUserPageResponseModel,
                                     )
-from sql_app.crud import send_otp, create_model, send_activation_email, get_email_activation_request_by_token, \
-    get_user_by_id, get_phone_activation_request_by_otp, send_forgot_password_email
+from sql_app.crud import send_otp, send_activation_email, get_user_by_id, get_latest_phone_activation_request, \
+    send_forgot_password_email, create_user_with_activation_request, deliver_otp, \
+    count_phone_activation_requests_since, consume_phone_activation_attempt
+from sql_app.database import RoutingSession
+from sql_app.identifier_index import IdentifierIndex
+from sql_app.login_events import LoginEventBuffer, LoginOutcome
+from sql_app.user_search import search_statement, search_users, export_users
+from sql_app.user_views import get_login_credentials, get_email_contact, get_phone_contact, UserEmailContact
 from sql_app.models import (User,
-                            EmailActivationRequest,
                             PhoneActivationRequest)
-from .error_responses import InvalidUsernameOrPasswordException, WrongOldPasswordException
+from .error_responses import (InvalidUsernameOrPasswordException,
+                              WrongOldPasswordException,
+                              TooManyLoginAttemptsException,
+                              ProfileNotFoundException,
+                              InvalidCursorException,
+                              OtpAttemptsExceededException,
+                              InvalidTokenException)
+from .hash_scheduler import HashScheduler, WorkClass
 from .messages import Messages
+from .profiling import RequestProfiler, run_in_threadpool
+from .signed_links import SignedLinkHandler
+from .throttle import LoginThrottle, RequestRateLimiter
 
-auth_handler = AuthHandler(algorithm=config('JWT_ALGORITHM'))
+hash_scheduler = HashScheduler(
+    limits={
+        WorkClass.LOGIN: config('HASH_CONCURRENCY_LOGIN', default=4, cast=int),
+        WorkClass.REGISTER: config('HASH_CONCURRENCY_REGISTER', default=2, cast=int),
+        WorkClass.UPDATE: config('HASH_CONCURRENCY_UPDATE', default=1, cast=int),
+    },
+    max_queue=config('HASH_QUEUE_MAX', default=16, cast=int),
+    latency_budget_seconds=config('HASH_LATENCY_BUDGET_MS', default=1000, cast=float) / 1000,
+)
+auth_handler = AuthHandler(algorithm=config('JWT_ALGORITHM'), scheduler=hash_scheduler)
+login_throttle = LoginThrottle(
+    free_attempts=config('LOGIN_THROTTLE_FREE_ATTEMPTS', default=5, cast=int),
+    ip_free_attempts=config('LOGIN_THROTTLE_IP_FREE_ATTEMPTS', default=20, cast=int),
+    base_lockout_seconds=config('LOGIN_THROTTLE_BASE_LOCKOUT_SECONDS', default=1, cast=float),
+    max_lockout_seconds=config('LOGIN_THROTTLE_MAX_LOCKOUT_SECONDS', default=900, cast=float),
+    reset_after_seconds=config('LOGIN_THROTTLE_RESET_SECONDS', default=3600, cast=float),
+)
+signed_links = SignedLinkHandler(secret=config('SIGNED_LINK_SECRET'))
+email_rate_limiter = RequestRateLimiter(
+    limit=int(config('EMAIL_ACTIVATION_LIMIT')),
+    window_seconds=int(config('EMAIL_ACTIVATION_EXP_MINUTES')) * 60,
+)
+identifier_index = IdentifierIndex(
+    capacity=config('IDENTIFIER_INDEX_CAPACITY', default=1_000_000, cast=int),
+    false_positive_rate=config('IDENTIFIER_INDEX_FALSE_POSITIVE_RATE', default=0.01, cast=float),
+    rebuild_interval_seconds=config('IDENTIFIER_INDEX_REBUILD_SECONDS', default=3600, cast=float),
+    refresh_interval_seconds=config('IDENTIFIER_INDEX_REFRESH_SECONDS', default=5, cast=float),
+)
+login_events = LoginEventBuffer(
+    batch_size=config('LOGIN_EVENTS_BATCH_SIZE', default=500, cast=int),
+    flush_interval_seconds=config('LOGIN_EVENTS_FLUSH_SECONDS', default=1, cast=float),
+)
+
+
+def email_activation_token(user: UserEmailContact) -> str:
+    return signed_links.create(SignedLinkHandler.EMAIL_ACTIVATION, user,
+                               expires_in=timedelta(minutes=int(config('EMAIL_ACTIVATION_EXP_MINUTES'))))
 
 
 class AuthRoutes:
     user_register = '/users'
     user_email_activation = '/users/email-activation/{token}'
-    user_phone_activation = '/users/phone-activation/{otp}'
+    user_phone_activation = '/users/phone-activation'
     user_resend_email_activation = '/users/resend-email-activation'
     user_resend_phone_activation = '/users/resend-phone-activation'
     user_login = '/users/login'
@@ -57,9 +111,65 @@ class AuthRoutes:
     user_update_info = '/users/update-info'
     user_forgot_password = '/users/forgot-password'
     user_reset_password = '/users/reset-password/{token}'
+    admin_login_throttle = '/admin/login-throttle'
+    admin_identifier_index = '/admin/identifier-index'
+    admin_identifier_index_rebuild = '/admin/identifier-index/rebuild'
+    admin_hash_scheduler = '/admin/hash-scheduler'
+    admin_profiles = '/admin/profiles'
+    admin_profile = '/admin/profiles/{profile_id}'
+    admin_users = '/admin/users'
+    admin_users_export = '/admin/users/export'
+
+
+# statements each endpoint may run on its happy path; enforced by sql_app.query_stats
+QUERY_BUDGETS = {
+    AuthRoutes.user_register: 1,
+    AuthRoutes.user_email_activation: 2,
+    AuthRoutes.user_phone_activation: 5,
+    AuthRoutes.user_resend_email_activation: 1,
+    AuthRoutes.user_resend_phone_activation: 3,
+    AuthRoutes.user_login: 1,
+    AuthRoutes.user_refresh_token: 0,
+    AuthRoutes.user_update_info: 3,
+    AuthRoutes.user_forgot_password: 1,
+    AuthRoutes.user_reset_password: 3,
+}
+
+# side-effecting routes that honor the Idempotency-Key header
+IDEMPOTENT_ROUTES = [
+    AuthRoutes.user_register,
+    AuthRoutes.user_resend_email_activation,
+    AuthRoutes.user_resend_phone_activation,
+    AuthRoutes.user_forgot_password,
+]
+
+request_profiler = RequestProfiler(
+    routes=[getattr(AuthRoutes, name) for name in config('PROFILE_ROUTES', default='', cast=Csv())]
+    or [route for name, route in vars(AuthRoutes).items() if name.startswith('user_')],
+    sample_rate=config('PROFILE_SAMPLE_RATE', default=0, cast=float),
+    debug_header=config('PROFILE_DEBUG_HEADER', default='X-Debug-Profile'),
+    debug_key=config('ADMIN_API_KEY', default=''),
+    interval_seconds=config('PROFILE_INTERVAL_MS', default=5, cast=float) / 1000,
+    ring_size=config('PROFILE_RING_SIZE', default=50, cast=int),
+)
+
+
+def auth_api(app: FastAPI, db: RoutingSession) -> None:
+    @app.on_event('startup')
+    def start_background_workers() -> None:
+        identifier_index.rebuild(db.get_bind())
+        identifier_index.start_background_sync(db.get_bind())
+        login_events.start(db.get_bind())
 
+    @app.on_event('startup')
+    async def reserve_threads_for_token_operations() -> None:
+        await hash_scheduler.reserve_threads(config('HASH_RESERVED_THREADS', default=16, cast=int))
+
+    @app.on_event('shutdown')
+    def stop_background_workers() -> None:
+        identifier_index.stop()
+        login_events.stop()
 
-def auth_api(app: FastAPI, db: Session) -> None:
     @app.post(AuthRoutes.user_register, response_model=UserRegisterResponseModel)
     async def register(
             request: UserRegisterRequestModel,
@@ -67,7 +177,7 @@ def auth_api(app: FastAPI, db: Session) -> None:
 
         if request.password != request.re_password:
             raise UnIdenticalPasswordsException()
-        hashed_password = auth_handler.get_password_hash(request.password)
+        hashed_password = await run_in_threadpool(auth_handler.get_password_hash, request.password)
 
         if request.phone_number or request.email:
             if request.phone_number and (not request.phone_number.startswith('09')
@@ -77,36 +187,34 @@ def auth_api(app: FastAPI, db: Session) -> None:
                                                   request.email):
                 raise InvalidEmailException()
 
-            user = User(password=hashed_password,
-                        phone_number=request.phone_number,
-                        email=request.email)
-            if db.query(User).filter(or_(User.phone_number == request.phone_number,
-                                         User.email == request.email)).first():
-                raise UserExistsException()
-            user = create_model(db, user)
+            user_id, otp = create_user_with_activation_request(db,
+                                                               password=hashed_password,
+                                                               email=request.email,
+                                                               phone_number=request.phone_number)
+            identifier_index.add(email=request.email, phone_number=request.phone_number)
             if request.phone_number:
-                send_otp(db, user.id, user.phone_number)
+                deliver_otp(request.phone_number, otp)
             else:
-                send_activation_email(db, user.id, user.email)
-            return UserRegisterResponseModel(phone_number=user.phone_number, email=user.email)
+                user = UserEmailContact(id=user_id, email=request.email, email_verified_at=None,
+                                        password=hashed_password)
+                await send_activation_email(request.email, email_activation_token(user))
+            return UserRegisterResponseModel(phone_number=request.phone_number, email=request.email)
         raise IncompleteFormException()
     @app.post(AuthRoutes.user_email_activation, response_model=BaseMessage)
     def email_account_activation(token: str) -> BaseMessage:
-        activation_request = get_email_activation_request_by_token(db, token)
-        if activation_request:
-            email_activation_exp_minutes = int(config('EMAIL_ACTIVATION_EXP_MINUTES'))
-            if (activation_request.date_created
-                    <
-                    datetime.utcnow() - timedelta(minutes=email_activation_exp_minutes)):
+        claims = signed_links.verify(token, SignedLinkHandler.EMAIL_ACTIVATION)
+        if claims:
+            if claims.expired:
                 raise ExpiredActivationTokenException()
 
-            user = get_user_by_id(db, activation_request.user)
+            db.use_primary()
+            user = get_user_by_id(db, claims.user_id)
             if not user:
                 raise InvalidUserException()
+            if not signed_links.matches(claims, user):
+                raise InvalidActivationTokenException()
             user.email_verified_at = datetime.utcnow()
             user.is_active = True
-
-            db.query(EmailActivationRequest).filter_by(user=user.id).delete()
             db.commit()
             return BaseMessage(
                 message=Messages.EMAIL_ACTIVATED.name,
@@ -115,8 +223,12 @@ def auth_api(app: FastAPI, db: Session) -> None:
         raise InvalidActivationTokenException()
 
     @app.post(AuthRoutes.user_phone_activation, response_model=BaseMessage)
-    def phone_activation(otp: int) -> BaseMessage:
-        activation_request = get_phone_activation_request_by_otp(db, otp)
+    def phone_activation(request: PhoneActivationRequestModel) -> BaseMessage:
+        if not request.phone_number.startswith('09') or len(request.phone_number) != 11:
+            raise InvalidPhoneNumberException()
+        # a lagging replica may not have the challenge that was just texted
+        db.use_primary()
+        activation_request = get_latest_phone_activation_request(db, request.phone_number)
         if activation_request:
             phone_activation_exp_minutes = int(config('PHONE_ACTIVATION_EXP_MINUTES'))
             if (activation_request.date_created
@@ -125,12 +237,22 @@ def auth_api(app: FastAPI, db: Session) -> None:
                 db.delete(activation_request)
                 db.commit()
                 raise ExpiredActivationTokenException()
-            user: User = get_user_by_id(db, activation_request.user)
+            # read before consuming the attempt: its commit expires the loaded request
+            expected_otp, user_id = activation_request.otp, activation_request.user
+            if not consume_phone_activation_attempt(db, activation_request.id,
+                                                    config('PHONE_ACTIVATION_MAX_ATTEMPTS', default=5, cast=int)):
+                raise OtpAttemptsExceededException()
+            if not hmac.compare_digest(str(expected_otp).encode(), str(request.otp).encode()):
+                raise InvalidActivationTokenException()
+            user: User = get_user_by_id(db, user_id)
             if not user:
                 raise InvalidUserException()
+            # the code was texted to this number; it must not verify a number the user moved to since
+            if user.phone_number != request.phone_number:
+                raise InvalidActivationTokenException()
             user.phone_verified_at = datetime.utcnow()
             user.is_active = True
-            db.query(PhoneActivationRequest).filter_by(user=user.id).delete()
+            db.query(PhoneActivationRequest).filter_by(phone_number=request.phone_number).delete()
             db.commit()
             return BaseMessage(
                 message=Messages.PHONE_ACTIVATED.name,
@@ -140,21 +262,16 @@ def auth_api(app: FastAPI, db: Session) -> None:
 
     @app.post(AuthRoutes.user_resend_email_activation, response_model=BaseMessage)
     async def resend_activation_email(request: ResendEmailActivationRequestModel) -> BaseMessage:
-        user: User = db.query(User).filter_by(email=request.email).first()
+        if not identifier_index.might_exist(email=request.email):
+            raise InvalidUserException()
+        user = get_email_contact(db, request.email)
         if not user:
             raise InvalidUserException()
         if user.email_verified_at:
             raise AlreadyActiveUserException()
-        email_limit = int(config('EMAIL_ACTIVATION_LIMIT'))
-        email_activation_exp_minutes = int(config('EMAIL_ACTIVATION_EXP_MINUTES'))
-        emails = db.query(EmailActivationRequest) \
-            .filter(EmailActivationRequest.date_created
-                    >
-                    datetime.utcnow() - timedelta(hours=email_activation_exp_minutes)). \
-            count()
-        if emails > email_limit:
+        if not email_rate_limiter.hit(user.email):
             raise ActivationEmailLimitException()
-        send_activation_email(db, user.id, user.email)
+        await send_activation_email(user.email, email_activation_token(user))
         return BaseMessage(
             message=Messages.EMAIL_ACTIVATION_RESEND.name,
             detail=Messages.EMAIL_ACTIVATION_RESEND.value
@@ -164,18 +281,19 @@ def auth_api(app: FastAPI, db: Session) -> None:
     async def resend_activation_sms(request: ResendPhoneActivationRequestModel) -> BaseMessage:
         if not request.phone_number.startswith('09') or len(request.phone_number) != 11:
             raise InvalidPhoneNumberException()
-        user: User = db.query(User).filter_by(phone_number=request.phone_number).first()
+        if not identifier_index.might_exist(phone_number=request.phone_number):
+            raise InvalidUserException()
+        user = get_phone_contact(db, request.phone_number)
         if not user:
             raise InvalidUserException()
         if user.phone_verified_at:
             raise AlreadyActiveUserException()
         phone_limit = int(config('PHONE_ACTIVATION_LIMIT'))
         phone_activation_exp_minutes = int(config('PHONE_ACTIVATION_EXP_MINUTES'))
-        sent_sms = db.query(PhoneActivationRequest) \
-            .filter(
-            PhoneActivationRequest.date_created > datetime.utcnow() - timedelta(hours=phone_activation_exp_minutes)) \
-            .count()
-        if sent_sms > phone_limit:
+        db.use_primary()
+        sent_sms = count_phone_activation_requests_since(
+            db, user.phone_number, datetime.utcnow() - timedelta(minutes=phone_activation_exp_minutes))
+        if sent_sms >= phone_limit:
             raise ActivationTextLimitException()
         send_otp(db, user.id, user.phone_number)
         return BaseMessage(
@@ -184,31 +302,108 @@ def auth_api(app: FastAPI, db: Session) -> None:
         )
 
     @app.post(AuthRoutes.user_login, response_model=UserLoginResponseModel)
-    def login(request: UserLoginRequestModel) -> UserLoginResponseModel:
-        user: User = db.query(User).filter(or_(User.email == request.email, User.phone_number == request.phone_number)). \
-            first()
+    async def login(request: UserLoginRequestModel, http_request: Request) -> UserLoginResponseModel:
+        account = login_throttle.account_key(email=request.email, phone_number=request.phone_number)
+        client_ip = http_request.client.host if http_request.client else None
+        try:
+            login_throttle.check(account, client_ip)
+        except TooManyLoginAttemptsException:
+            login_events.record(LoginOutcome.THROTTLED, identifier=account, ip=client_ip)
+            raise
+        if not identifier_index.might_exist(email=request.email, phone_number=request.phone_number):
+            login_throttle.record_failure(account, client_ip)
+            login_events.record(LoginOutcome.UNKNOWN_USER, identifier=account, ip=client_ip)
+            raise InvalidUserException()
+        user = get_login_credentials(db, email=request.email, phone_number=request.phone_number)
         if not user:
+            login_throttle.record_failure(account, client_ip)
+            login_events.record(LoginOutcome.UNKNOWN_USER, identifier=account, ip=client_ip)
             raise InvalidUserException()
+        # only the hash takes a threadpool thread, so a burst of logins waiting for the
+        # hash scheduler can not hold more threads than it admits
         if (user and user.is_active
-                and auth_handler.verify_password(plain_password=request.password,
-                                                 hashed_password=user.password)):
+                and await run_in_threadpool(auth_handler.verify_password, plain_password=request.password,
+                                            hashed_password=user.password)):
+            login_throttle.record_success(account)
+            login_events.record(LoginOutcome.SUCCESS, user_id=user.id, identifier=account, ip=client_ip)
             acc_token = auth_handler.encode_token(user_id=user.id, access_token=True)
             ref_token = auth_handler.encode_token(user_id=user.id, access_token=False)
             return UserLoginResponseModel(access=acc_token, refresh=ref_token)
+        login_throttle.record_failure(account, client_ip)
+        login_events.record(LoginOutcome.INVALID_CREDENTIALS, user_id=user.id, identifier=account, ip=client_ip)
         raise InvalidUsernameOrPasswordException()
 
-    @app.post(AuthRoutes.user_refresh_token, response_model=UserRegisterResponseModel)
-    def refresh_token(request: UserRefreshTokenRequestModel) -> Union[HTTPException, UserRefreshTokenResponseModel]:
+    @app.get(AuthRoutes.admin_identifier_index, response_model=IdentifierIndexStatsResponseModel)
+    def identifier_index_stats(_=Depends(auth_handler.admin_wrapper)) -> IdentifierIndexStatsResponseModel:
+        return IdentifierIndexStatsResponseModel(**identifier_index.stats())
+
+    @app.post(AuthRoutes.admin_identifier_index_rebuild, response_model=IdentifierIndexStatsResponseModel)
+    def identifier_index_rebuild(_=Depends(auth_handler.admin_wrapper)) -> IdentifierIndexStatsResponseModel:
+        return IdentifierIndexStatsResponseModel(**identifier_index.rebuild(db.get_bind()))
+
+    @app.get(AuthRoutes.admin_hash_scheduler, response_model=HashSchedulerStatsResponseModel)
+    def hash_scheduler_stats(_=Depends(auth_handler.admin_wrapper)) -> HashSchedulerStatsResponseModel:
+        return HashSchedulerStatsResponseModel(**hash_scheduler.stats())
+
+    @app.get(AuthRoutes.admin_profiles, response_model=List[ProfileSummaryModel])
+    def list_profiles(_=Depends(auth_handler.admin_wrapper)) -> List[ProfileSummaryModel]:
+        return [ProfileSummaryModel(**summary) for summary in request_profiler.profiles()]
+
+    @app.get(AuthRoutes.admin_profile, response_class=PlainTextResponse)
+    def get_profile(profile_id: int, _=Depends(auth_handler.admin_wrapper)) -> PlainTextResponse:
+        profile = request_profiler.get(profile_id)
+        if not profile:
+            raise ProfileNotFoundException()
+        return PlainTextResponse(profile.folded())
+
+    @app.get(AuthRoutes.admin_users, response_model=AdminUserPageResponseModel)
+    def admin_search_users(email_verified: Optional[bool] = None,
+                           phone_verified: Optional[bool] = None,
+                           created_after: Optional[datetime] = None,
+                           created_before: Optional[datetime] = None,
+                           cursor: Optional[str] = None,
+                           limit: int = Query(default=100, ge=1, le=1000),
+                           _=Depends(auth_handler.admin_wrapper)) -> AdminUserPageResponseModel:
+        statement = search_statement(email_verified, phone_verified, created_after, created_before)
+        try:
+            rows, next_cursor = search_users(db, statement, cursor=cursor, limit=limit)
+        except ValueError:
+            raise InvalidCursorException()
+        return AdminUserPageResponseModel(items=[AdminUserModel(**row._asdict()) for row in rows],
+                                          next_cursor=next_cursor)
+
+    @app.get(AuthRoutes.admin_users_export)
+    def admin_export_users(email_verified: Optional[bool] = None,
+                           phone_verified: Optional[bool] = None,
+                           created_after: Optional[datetime] = None,
+                           created_before: Optional[datetime] = None,
+                           export_format: str = Query(default='ndjson', alias='format', pattern='^(ndjson|csv)$'),
+                           _=Depends(auth_handler.admin_wrapper)) -> StreamingResponse:
+        statement = search_statement(email_verified, phone_verified, created_after, created_before)
+        return StreamingResponse(export_users(db.reader(), statement, export_format),
+                                 media_type='text/csv' if export_format == 'csv' else 'application/x-ndjson')
+
+    @app.get(AuthRoutes.admin_login_throttle, response_model=LoginThrottleStatsResponseModel)
+    def login_throttle_stats(_=Depends(auth_handler.admin_wrapper)) -> LoginThrottleStatsResponseModel:
+        return LoginThrottleStatsResponseModel(**login_throttle.stats())
+
+    @app.post(AuthRoutes.user_refresh_token, response_model=UserRefreshTokenResponseModel)
+    def refresh_token(request: UserRefreshTokenRequestModel) -> UserRefreshTokenResponseModel:
+        if not auth_handler.token_is_refresh(request.refresh):
+            raise InvalidTokenException()
         user_id = auth_handler.decode_token(token=request.refresh)
         new_acc_token = auth_handler.encode_token(user_id=user_id, access_token=True)
-        return UserRefreshTokenResponseModel(accessToken=new_acc_token)
+        return UserRefreshTokenResponseModel(access=new_acc_token)
 
     @app.patch(AuthRoutes.user_update_info, response_model=UpdateInfoResponseModel)
     def update_info(request: UpdateInfoRequestModel,
-                    username=Depends(auth_handler.auth_wrapper)) -> UpdateInfoResponseModel:
-        user: User = db.query(User).filter_by(username=username).first()
+                    user_id=Depends(auth_handler.auth_wrapper)) -> UpdateInfoResponseModel:
+        # old_password must be checked against the current hash, not a replica's copy
+        db.use_primary()
+        user: User = get_user_by_id(db, user_id)
         if user and auth_handler.verify_password(plain_password=request.old_password,
-                                                 hashed_password=user.password):
+                                                 hashed_password=user.password,
+                                                 work_class=WorkClass.UPDATE):
 
             if request.email:
                 user.email = request.email
@@ -217,28 +412,35 @@ def auth_api(app: FastAPI, db: Session) -> None:
                 user.phone_number = request.phone_number
                 user.phone_verified_at = None
             if request.new_password:
-                if auth_handler.verify_password(plain_password=request.new_password, hashed_password=user.password):
+                if auth_handler.verify_password(plain_password=request.new_password, hashed_password=user.password,
+                                                work_class=WorkClass.UPDATE):
                     raise NewPasswordException()
-                user.password = auth_handler.get_password_hash(request.new_password)
+                user.password = auth_handler.get_password_hash(request.new_password, work_class=WorkClass.UPDATE)
+            # lets the identifier index of other workers pick up a changed email or phone number
+            user.date_updated = datetime.utcnow()
             try:
                 db.commit()
             except IntegrityError as e:
                 db.rollback()
                 raise DataBaseIntegrityException(message=e.orig.args[0])
-            return UpdateInfoResponseModel(new_username=user.username,
-                                           new_password=request.new_password,
+            identifier_index.add(email=user.email, phone_number=user.phone_number)
+            return UpdateInfoResponseModel(new_password=request.new_password,
                                            new_email=user.email)
         raise WrongOldPasswordException()
 
     @app.put(AuthRoutes.user_update_info, response_model=UpdateInfoResponseModel)
     def update_info(request: UpdateInfoRequestModel,
-                    username=Depends(auth_handler.auth_wrapper)) -> UpdateInfoResponseModel:
-        user: User = db.query(User).filter_by(username=username).first()
+                    user_id=Depends(auth_handler.auth_wrapper)) -> UpdateInfoResponseModel:
+        # old_password must be checked against the current hash, not a replica's copy
+        db.use_primary()
+        user: User = get_user_by_id(db, user_id)
         if user and auth_handler.verify_password(plain_password=request.old_password,
-                                                 hashed_password=user.password):
+                                                 hashed_password=user.password,
+                                                 work_class=WorkClass.UPDATE):
             if (not request.phone_number and not request.email) or not request.new_password:
                 raise IncompleteFormException()
-            if auth_handler.verify_password(plain_password=request.new_password, hashed_password=user.password):
+            if auth_handler.verify_password(plain_password=request.new_password, hashed_password=user.password,
+                                            work_class=WorkClass.UPDATE):
                 raise NewPasswordException()
             if request.email and not re.fullmatch(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
                                                   request.email):
@@ -249,59 +451,53 @@ def auth_api(app: FastAPI, db: Session) -> None:
                 user.email_verified_at = None
             if request.phone_number != user.phone_number:
                 user.phone_verified_at = None
-            user.password = auth_handler.get_password_hash(request.new_password)
+            user.password = auth_handler.get_password_hash(request.new_password, work_class=WorkClass.UPDATE)
+            user.date_updated = datetime.utcnow()
             try:
                 db.commit()
             except IntegrityError as e:
                 db.rollback()
                 raise DataBaseIntegrityException(message=e.orig.args[0])
-            return UpdateInfoResponseModel(new_username=user.username,
-                                           new_password=request.new_password,
+            identifier_index.add(email=user.email, phone_number=user.phone_number)
+            return UpdateInfoResponseModel(new_password=request.new_password,
                                            new_email=user.email)
         raise WrongOldPasswordException()
 
     @app.post(AuthRoutes.user_forgot_password, response_model=BaseMessage)
     async def forgot_password(request: ResendEmailActivationRequestModel) -> BaseMessage:
         email = request.email
-        user: User = db.query(User).filter_by(email=email).first()
+        if not identifier_index.might_exist(email=email):
+            raise InvalidEmailException()
+        user = get_email_contact(db, email)
         if user:
-            email_limit = int(config('EMAIL_ACTIVATION_LIMIT'))
-            email_activation_exp_minutes = int(config('EMAIL_ACTIVATION_EXP_MINUTES'))
-            emails = db.query(EmailActivationRequest) \
-                .filter(EmailActivationRequest.date_created
-                        >
-                        datetime.utcnow() - timedelta(minutes=email_activation_exp_minutes)). \
-                count()
-            if emails > email_limit:
+            if not email_rate_limiter.hit(email):
                 raise ResetPasswordEmailLimitException()
-            send_forgot_password_email(db, email=email, user_id=user.id)
+            token = signed_links.create(SignedLinkHandler.RESET_PASSWORD, user,
+                                        expires_in=timedelta(minutes=int(config('EMAIL_ACTIVATION_EXP_MINUTES'))))
+            await send_forgot_password_email(email=email, token=token)
             return BaseMessage(message=Messages.EMAIL_SENT.name, detail=Messages.EMAIL_SENT.value)
         raise InvalidEmailException()
 
     @app.post(AuthRoutes.user_reset_password, response_model=BaseMessage)
     async def reset_password(token: str, request: ResetPasswordRequestModel) -> BaseMessage:
-        reset_password_request = get_email_activation_request_by_token(db, token)
-        if reset_password_request:
-            email_activation_exp_minutes = int(config('EMAIL_ACTIVATION_EXP_MINUTES'))
-            if (reset_password_request.date_created
-                    <
-                    datetime.utcnow() - timedelta(
-                        minutes=email_activation_exp_minutes)):
-                db.delete(reset_password_request)
-                db.commit()
+        claims = signed_links.verify(token, SignedLinkHandler.RESET_PASSWORD)
+        if claims:
+            if claims.expired:
                 raise ExpiredResetPasswordTokenException()
-            user: User = db.query(User).filter_by(id=reset_password_request.user).first()
-            if user:
+            # the link fingerprint must be checked against the current password hash
+            db.use_primary()
+            user: User = get_user_by_id(db, claims.user_id)
+            if user and signed_links.matches(claims, user):
                 if request.password != request.re_password:
                     raise UnIdenticalPasswordsException()
-                if auth_handler.verify_password(plain_password=request.password, hashed_password=user.password):
+                if await run_in_threadpool(auth_handler.verify_password, plain_password=request.password,
+                                           hashed_password=user.password, work_class=WorkClass.UPDATE):
                     raise NewPasswordException()
-                user.password = auth_handler.get_password_hash(password=request.password)
+                user.password = await run_in_threadpool(auth_handler.get_password_hash, password=request.password,
+                                                        work_class=WorkClass.UPDATE)
                 db.commit()
                 await send_email(subject='password reset successful',
                                  recipients=[user.email],
                                  body='your password has been changed successfully')
-                db.query(EmailActivationRequest).filter_by(user_email=user.email).delete()
-                db.commit()
                 return BaseMessage(message=Messages.PASSWORD_CHANGED.name, detail=Messages.PASSWORD_CHANGED.value)
         raise InvalidResetPasswordTokenException()
\ No newline at end of file
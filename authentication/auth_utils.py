@@ -1,30 +1,37 @@
+import hmac
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional
 
 import jwt
 from decouple import config
-from fastapi import  Security
+from fastapi import Header, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from fastapi_mail import FastMail, MessageSchema
+from fastapi_mail import FastMail, MessageSchema, MessageType
 from passlib.context import CryptContext
 from authentication.error_responses import InvalidTokenException, ExpiredSignatureException
+from authentication.hash_scheduler import HashScheduler, WorkClass
 from configuration.email_config import email_conf
-from configuration.private_key_config import private_key
+from configuration.private_key_config import private_key, public_key
 
 
 class AuthHandler:
     security = HTTPBearer()
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-    def __init__(self, algorithm: str):
+    def __init__(self, algorithm: str, scheduler: Optional[HashScheduler] = None):
         self.algorithm = algorithm
-        with open("../private-key.pem", "rb") as key_file:
-            self.private_key = key_file.read()
+        self.scheduler = scheduler
+        self.private_key = private_key
+        self.public_key = public_key
     # todo : add init for JWT Auth
-    def get_password_hash(self, password):
+    def get_password_hash(self, password, work_class: str = WorkClass.REGISTER):
+        if self.scheduler:
+            return self.scheduler.run(work_class, self.pwd_context.hash, password)
         return self.pwd_context.hash(password)
 
-    def verify_password(self, plain_password, hashed_password):
+    def verify_password(self, plain_password, hashed_password, work_class: str = WorkClass.LOGIN):
+        if self.scheduler:
+            return self.scheduler.run(work_class, self.pwd_context.verify, plain_password, hashed_password)
         return self.pwd_context.verify(plain_password, hashed_password)
 
     def encode_token(self, user_id, access_token: bool):
@@ -46,33 +53,37 @@ class AuthHandler:
             algorithm=self.algorithm
         )
 
-    def decode_token(self, token):
+    def _decode(self, token) -> dict:
         try:
-            payload = jwt.decode(token, self.private_key, algorithms=self.algorithm)
-            return payload['sub']
+            return jwt.decode(token, self.public_key, algorithms=[self.algorithm])
         except jwt.ExpiredSignatureError:
             raise ExpiredSignatureException()
         except jwt.InvalidTokenError:
             raise InvalidTokenException()
 
+    def decode_token(self, token):
+        return self._decode(token)['user_id']
+
     def token_is_refresh(self, token) -> bool:
-        payload = jwt.decode(token, self.private_key, algorithms=self.algorithm)
-        if payload['type'] == 'refresh':
-            return True
-        return False
+        return self._decode(token)['type'] == 'refresh'
 
     def auth_wrapper(self, auth: HTTPAuthorizationCredentials = Security(security)):
         if self.token_is_refresh(auth.credentials):
             raise InvalidTokenException()
         return self.decode_token(auth.credentials)
 
+    def admin_wrapper(self, x_admin_key: str = Header(default=None)):
+        admin_key = config('ADMIN_API_KEY', default='')
+        if not admin_key or not x_admin_key or not hmac.compare_digest(x_admin_key, admin_key):
+            raise InvalidTokenException()
+
 
 async def send_email(subject: str, recipients: List[str], body: str):
     message = MessageSchema(
         subject=subject,
         recipients=recipients,
         body=body,
-
+        subtype=MessageType.plain,
     )
     fm = FastMail(email_conf)
     await fm.send_message(message)
\ No newline at end of file
@@ -27,6 +27,13 @@ class Codes:
     ActivationTextLimit = 20
     AlreadyExists = 21
     InternalServerError = 22
+    LoginThrottled = 23
+    ServiceOverloaded = 24
+    ProfileNotFound = 25
+    IdempotencyKeyReused = 26
+    IdempotencyRequestInProgress = 27
+    InvalidCursor = 28
+    OtpAttemptsExceeded = 29
 
 
 class BaseMessage:
@@ -170,11 +177,63 @@ class ExpiredSignatureException(Exception):
 
 
 class UserExistsException(Exception):
+    def __init__(self, field: str = None):
+        if field:
+            self.message = f'Conflict: {field} already exists'
+
     status_code = status.HTTP_409_CONFLICT
     message = 'Conflict: already exists'
     error_code = Codes.AlreadyExists
 
 
+class TooManyLoginAttemptsException(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    message = 'too many failed login attempts please try again later'
+    error_code = Codes.LoginThrottled
+
+
+class ServiceOverloadedException(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    message = 'service is overloaded please try again later'
+    error_code = Codes.ServiceOverloaded
+
+
+class ProfileNotFoundException(Exception):
+    status_code = status.HTTP_404_NOT_FOUND
+    message = 'profile not found or already evicted'
+    error_code = Codes.ProfileNotFound
+
+
+class IdempotencyKeyReusedException(Exception):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    message = 'idempotency key was already used for a different request'
+    error_code = Codes.IdempotencyKeyReused
+
+
+class IdempotencyRequestInProgressException(Exception):
+    status_code = status.HTTP_409_CONFLICT
+    message = 'a request with this idempotency key is still in progress'
+    error_code = Codes.IdempotencyRequestInProgress
+
+
+class InvalidCursorException(Exception):
+    status_code = status.HTTP_400_BAD_REQUEST
+    message = 'invalid pagination cursor'
+    error_code = Codes.InvalidCursor
+
+
+class OtpAttemptsExceededException(Exception):
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    message = 'too many wrong codes please request a new activation text'
+    error_code = Codes.OtpAttemptsExceeded
+
+
 def handlers(app: FastAPI) -> None:
     @app.exception_handler(UnIdenticalPasswordsException)
     async def unidentical_passwords_handler(request: Request, exc: UnIdenticalPasswordsException):
@@ -260,4 +319,26 @@ def handlers(app: FastAPI) -> None:
     async def unidentical_already_exists(request: Request, exc: UserExistsException):
         return BaseMessage(exc.error_code, exc.message, exc.status_code).response
 
+    @app.exception_handler(TooManyLoginAttemptsException)
+    async def too_many_login_attempts_handler(request: Request, exc: TooManyLoginAttemptsException):
+        response = BaseMessage(exc.error_code, exc.message, exc.status_code).response
+        response.headers['Retry-After'] = str(exc.retry_after)
+        return response
 
+    @app.exception_handler(ServiceOverloadedException)
+    async def service_overloaded_handler(request: Request, exc: ServiceOverloadedException):
+        response = BaseMessage(exc.error_code, exc.message, exc.status_code).response
+        response.headers['Retry-After'] = str(exc.retry_after)
+        return response
+
+    @app.exception_handler(ProfileNotFoundException)
+    async def profile_not_found_handler(request: Request, exc: ProfileNotFoundException):
+        return BaseMessage(exc.error_code, exc.message, exc.status_code).response
+
+    @app.exception_handler(InvalidCursorException)
+    async def invalid_cursor_handler(request: Request, exc: InvalidCursorException):
+        return BaseMessage(exc.error_code, exc.message, exc.status_code).response
+
+    @app.exception_handler(OtpAttemptsExceededException)
+    async def otp_attempts_exceeded_handler(request: Request, exc: OtpAttemptsExceededException):
+        return BaseMessage(exc.error_code, exc.message, exc.status_code).response
@@ -0,0 +1,125 @@
+import math
+import threading
+import time
+from typing import Callable, Dict
+
+import anyio.to_thread
+
+from authentication.error_responses import ServiceOverloadedException
+
+
+class WorkClass:
+    LOGIN = 'login'
+    REGISTER = 'register'
+    UPDATE = 'update'
+
+
+class _ClassStats:
+    __slots__ = ('limit', 'semaphore', 'in_flight', 'waiting', 'completed', 'shed',
+                 'wait_total', 'wait_max', 'service_avg')
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.shed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.service_avg = 0.25
+
+
+class HashScheduler:
+    """
+      Admission control for password hashing. Every work class has its own
+      concurrency limit and callers over the limit wait in a queue shared by all
+      classes. A call is shed with ServiceOverloadedException when that queue is
+      full or its expected wait exceeds the latency budget, so hashing sent to the
+      threadpool on its own (register, login, reset_password) holds at most
+      `max_threads` worker threads, plus a brief one per call being shed.
+
+      `reserve_threads` sizes the threadpool so that `reserved` threads are left
+      beyond that. This is a capacity reservation, not a priority: refresh_token
+      and the other sync handlers still share anyio's FIFO limiter, and wait
+      behind hashing only when more than `reserved` threads are busy with other
+      work, e.g. update_info, which runs its whole handler in a thread.
+    """
+
+    def __init__(self, limits: Dict[str, int], max_queue: int = 16, latency_budget_seconds: float = 1.0):
+        self.max_queue = max_queue
+        self.latency_budget_seconds = latency_budget_seconds
+        self._classes = {work_class: _ClassStats(limit) for work_class, limit in limits.items()}
+        self._lock = threading.Lock()
+
+    @property
+    def max_threads(self) -> int:
+        return sum(s.limit for s in self._classes.values()) + self.max_queue
+
+    async def reserve_threads(self, reserved: int) -> None:
+        """
+          Grows anyio's default threadpool, used by sync handlers and run_in_threadpool,
+          so that `reserved` threads stay free even when hashing holds `max_threads`.
+          Must be called from the event loop, e.g. in a startup handler.
+        """
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        limiter.total_tokens = max(limiter.total_tokens, self.max_threads + reserved)
+
+    def run(self, work_class: str, fn: Callable, *args, **kwargs):
+        stats = self._classes[work_class]
+        with self._lock:
+            queued = sum(s.waiting for s in self._classes.values())
+            expected_wait = 0.0
+            if stats.in_flight + stats.waiting >= stats.limit:
+                expected_wait = (stats.waiting + 1) / stats.limit * stats.service_avg
+            if queued >= self.max_queue or expected_wait > self.latency_budget_seconds:
+                stats.shed += 1
+                raise ServiceOverloadedException(retry_after=max(1, math.ceil(expected_wait)))
+            stats.waiting += 1
+
+        started = time.monotonic()
+        acquired = stats.semaphore.acquire(timeout=self.latency_budget_seconds)
+        waited = time.monotonic() - started
+        with self._lock:
+            stats.waiting -= 1
+            if not acquired:
+                stats.shed += 1
+            else:
+                stats.in_flight += 1
+                stats.wait_total += waited
+                stats.wait_max = max(stats.wait_max, waited)
+        if not acquired:
+            raise ServiceOverloadedException(retry_after=max(1, math.ceil(self.latency_budget_seconds)))
+
+        started = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            service = time.monotonic() - started
+            with self._lock:
+                stats.in_flight -= 1
+                stats.completed += 1
+                stats.service_avg = 0.8 * stats.service_avg + 0.2 * service
+            stats.semaphore.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'queue_depth': sum(s.waiting for s in self._classes.values()),
+                'max_queue': self.max_queue,
+                'latency_budget_ms': self.latency_budget_seconds * 1000,
+                'classes': {
+                    work_class: {
+                        'limit': s.limit,
+                        'in_flight': s.in_flight,
+                        'waiting': s.waiting,
+                        'completed': s.completed,
+                        'shed': s.shed,
+                        'avg_wait_ms': s.wait_total / (s.completed + s.in_flight) * 1000
+                        if s.completed + s.in_flight else 0.0,
+                        'max_wait_ms': s.wait_max * 1000,
+                        'avg_service_ms': s.service_avg * 1000,
+                    }
+                    for work_class, s in self._classes.items()
+                },
+            }
@@ -0,0 +1,219 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from redis import asyncio as aioredis
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from authentication.error_responses import (BaseMessage,
+                                            IdempotencyKeyReusedException,
+                                            IdempotencyRequestInProgressException)
+
+
+class StoredResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class _Entry:
+    __slots__ = ('fingerprint', 'response', 'expires_at', 'done')
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.response: Optional[StoredResponse] = None
+        self.expires_at = expires_at
+        self.done = asyncio.Event()
+
+
+class LocalIdempotencyStore:
+    """
+      Process-local store. Duplicates of an in-flight request wait on the first
+      request's completion instead of running the handler again.
+    """
+
+    def __init__(self, ttl_seconds: float, lock_seconds: float = 60, max_entries: int = 100_000):
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+
+    async def acquire(self, key: str, fingerprint: str, wait_seconds: float) -> Optional[StoredResponse]:
+        """
+          Returns None when the caller owns `key` and must run the request,
+          otherwise the stored response to replay.
+        """
+        while True:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                entry.done.set()
+                entry = None
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    self._purge(now)
+                self._entries[key] = _Entry(fingerprint, now + self.lock_seconds)
+                return None
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyReusedException()
+            if entry.response is not None:
+                return entry.response
+            try:
+                await asyncio.wait_for(entry.done.wait(), wait_seconds)
+            except asyncio.TimeoutError:
+                raise IdempotencyRequestInProgressException()
+
+    async def complete(self, key: str, fingerprint: str, response: StoredResponse) -> None:
+        entry = self._entries.get(key)
+        if entry is None or entry.fingerprint != fingerprint:
+            return
+        entry.response = response
+        entry.expires_at = time.monotonic() + self.ttl_seconds
+        entry.done.set()
+
+    async def release(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.done.set()
+
+    def _purge(self, now: float) -> None:
+        for key in [k for k, entry in self._entries.items() if entry.expires_at <= now]:
+            self._entries.pop(key).done.set()
+        if len(self._entries) >= self.max_entries:
+            # still full of live keys: forget the oldest half of the stored responses rather
+            # than grow unbounded; in-flight keys are kept so their duplicates still wait
+            completed = sorted((k for k, entry in self._entries.items() if entry.response is not None),
+                               key=lambda k: self._entries[k].expires_at)
+            for key in completed[:len(self._entries) // 2]:
+                self._entries.pop(key).done.set()
+
+
+class RedisIdempotencyStore:
+    """
+      Store shared by every worker. The first request takes the key with SET NX;
+      duplicates poll it until the owner stores its response or releases it.
+    """
+
+    def __init__(self, url: str, ttl_seconds: float, lock_seconds: float = 60, poll_seconds: float = 0.05):
+        self.redis = aioredis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.poll_seconds = poll_seconds
+
+    async def acquire(self, key: str, fingerprint: str, wait_seconds: float) -> Optional[StoredResponse]:
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            if await self.redis.set(key, json.dumps({'fingerprint': fingerprint}), nx=True,
+                                    ex=int(self.lock_seconds)):
+                return None
+            raw = await self.redis.get(key)
+            if raw is not None:
+                data = json.loads(raw)
+                if data['fingerprint'] != fingerprint:
+                    raise IdempotencyKeyReusedException()
+                if 'status' in data:
+                    return StoredResponse(status=data['status'],
+                                          headers=[(k.encode('latin-1'), v.encode('latin-1'))
+                                                   for k, v in data['headers']],
+                                          body=base64.b64decode(data['body']))
+                if time.monotonic() > deadline:
+                    raise IdempotencyRequestInProgressException()
+                await asyncio.sleep(self.poll_seconds)
+
+    async def complete(self, key: str, fingerprint: str, response: StoredResponse) -> None:
+        await self.redis.set(key, json.dumps({
+            'fingerprint': fingerprint,
+            'status': response.status,
+            'headers': [(k.decode('latin-1'), v.decode('latin-1')) for k, v in response.headers],
+            'body': base64.b64encode(response.body).decode(),
+        }), ex=int(self.ttl_seconds))
+
+    async def release(self, key: str) -> None:
+        await self.redis.delete(key)
+
+
+class IdempotencyMiddleware:
+    """
+      Honors the Idempotency-Key header on the given POST routes. A retried
+      request with the same key and body gets the first response replayed
+      (marked with Idempotent-Replayed) without running the handler again;
+      5xx responses are not stored so the client can retry them.
+    """
+    header = b'idempotency-key'
+
+    def __init__(self, app: ASGIApp, routes: Iterable[str], store, wait_seconds: float = 30,
+                 max_body_bytes: int = 64 * 1024):
+        self.app = app
+        self.routes = [(route, compile_path(route)[0]) for route in routes]
+        self.store = store
+        self.wait_seconds = wait_seconds
+        self.max_body_bytes = max_body_bytes
+
+    def _route_for(self, path: str) -> Optional[str]:
+        return next((route for route, pattern in self.routes if pattern.match(path)), None)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['method'] != 'POST':
+            return await self.app(scope, receive, send)
+        idempotency_key = dict(scope['headers']).get(self.header)
+        route = self._route_for(scope['path']) if idempotency_key else None
+        if route is None:
+            return await self.app(scope, receive, send)
+
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            more_body = message.get('more_body', False)
+        body = b''.join(chunks)
+        key = f'idempotency:{route}:{idempotency_key.decode("latin-1")}'
+        fingerprint = hashlib.sha256(scope['path'].encode() + b'\0' + body).hexdigest()
+
+        try:
+            stored = await self.store.acquire(key, fingerprint, self.wait_seconds)
+        except (IdempotencyKeyReusedException, IdempotencyRequestInProgressException) as exc:
+            return await BaseMessage(exc.error_code, exc.message, exc.status_code).response(scope, receive, send)
+        if stored is not None:
+            await send({'type': 'http.response.start', 'status': stored.status,
+                        'headers': stored.headers + [(b'idempotent-replayed', b'true')]})
+            await send({'type': 'http.response.body', 'body': stored.body})
+            return
+
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        response = {'status': 500, 'headers': [], 'body': []}
+        size = 0
+
+        async def capture_send(message: Message) -> None:
+            nonlocal size
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = list(message.get('headers', []))
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+                if size <= self.max_body_bytes:
+                    response['body'].append(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await self.store.release(key)
+            raise
+        if response['status'] >= 500 or size > self.max_body_bytes:
+            await self.store.release(key)
+        else:
+            await self.store.complete(key, fingerprint, StoredResponse(response['status'], response['headers'],
+                                                                       b''.join(response['body'])))
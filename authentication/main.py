@@ -1,15 +1,36 @@
+from decouple import config
 from fastapi import FastAPI
 import uvicorn
-from sql_app.database import get_db
+from sql_app import query_stats
+from sql_app.database import get_db, request_scoped_routing, RoutingSession
 from authentication import auth
 from authentication import error_responses
+from authentication import profiling
+from authentication.idempotency import IdempotencyMiddleware, LocalIdempotencyStore, RedisIdempotencyStore
 app = FastAPI()
 
 
-def main():
-    db, _ = get_db()
+def setup(app: FastAPI, db: RoutingSession) -> None:
+    app.router.route_class = profiling.ProfiledRoute
     auth.auth_api(app, db)
     error_responses.handlers(app)
+    request_scoped_routing(app)
+    profiling.middleware(app, auth.request_profiler)
+    query_stats.middleware(app, auth.QUERY_BUDGETS, enforce=config('QUERY_BUDGET_ENFORCE', default=False, cast=bool))
+    idempotency_ttl = config('IDEMPOTENCY_TTL_SECONDS', default=86400, cast=float)
+    if config('IDEMPOTENCY_REDIS_URL', default=''):
+        idempotency_store = RedisIdempotencyStore(config('IDEMPOTENCY_REDIS_URL'), ttl_seconds=idempotency_ttl)
+    else:
+        idempotency_store = LocalIdempotencyStore(ttl_seconds=idempotency_ttl)
+    app.add_middleware(IdempotencyMiddleware,
+                       routes=auth.IDEMPOTENT_ROUTES,
+                       store=idempotency_store,
+                       wait_seconds=config('IDEMPOTENCY_WAIT_SECONDS', default=30, cast=float))
+
+
+def main():
+    db, _ = get_db()
+    setup(app, db)
     uvicorn.run(app)
 
 
@@ -0,0 +1,192 @@
+import asyncio
+import contextvars
+import functools
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Iterable, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.routing import APIRoute
+from starlette import concurrency
+from starlette.routing import compile_path
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Profile:
+    __slots__ = ('id', 'method', 'route', 'started_at', 'duration_ms', 'samples', 'stacks', 'threads', 'done')
+
+    def __init__(self, profile_id: int, method: str, route: str):
+        self.id = profile_id
+        self.method = method
+        self.route = route
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.samples = 0
+        self.stacks = Counter()
+        # idents of the threads currently running this request's code
+        self.threads = set()
+        self.done = threading.Event()
+
+    def folded(self) -> str:
+        """
+          Stacks in the collapsed "frame;frame;frame count" format read by
+          flamegraph.pl, inferno and speedscope.
+        """
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {
+            'id': self.id,
+            'method': self.method,
+            'route': self.route,
+            'started_at': self.started_at,
+            'duration_ms': self.duration_ms,
+            'samples': self.samples,
+        }
+
+
+_current_profile: contextvars.ContextVar[Optional[Profile]] = contextvars.ContextVar('profile', default=None)
+
+
+def tracked(fn: Callable) -> Callable:
+    """
+      Wraps a function that runs in a worker thread so that, while it runs for a
+      profiled request, the sampler records that thread.
+    """
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        thread = threading.get_ident()
+        profile.threads.add(thread)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.threads.discard(thread)
+    return run
+
+
+async def run_in_threadpool(fn: Callable, *args, **kwargs):
+    return await concurrency.run_in_threadpool(tracked(fn), *args, **kwargs)
+
+
+class ProfiledRoute(APIRoute):
+    """
+      Route class whose sync endpoints, which FastAPI runs in the threadpool, are
+      recorded by the profiler. Set as the router's route_class before adding routes.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = tracked(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class RequestProfiler:
+    """
+      Opt-in sampling profiler for requests. A sampled request gets a thread
+      that snapshots the request's threads each `interval_seconds`: the event
+      loop while it runs project code, and the worker threads registered by
+      `tracked` while they run the handler or its hashing. bcrypt, RS256,
+      database and SMS time all show up under the handler that caused them,
+      while background writers and unrelated worker threads are left out. Only
+      one request is profiled at a time and the last `ring_size` profiles are kept.
+    """
+
+    def __init__(self,
+                 routes: Iterable[str],
+                 sample_rate: float = 0.0,
+                 debug_header: str = 'X-Debug-Profile',
+                 debug_key: str = '',
+                 interval_seconds: float = 0.005,
+                 ring_size: int = 50):
+        self.routes = [(route, compile_path(route)[0]) for route in routes]
+        self.sample_rate = sample_rate
+        self.debug_header = debug_header
+        self.debug_key = debug_key
+        self.interval_seconds = interval_seconds
+        self._profiles = deque(maxlen=ring_size)
+        self._ids = itertools.count(1)
+        self._busy = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    def route_for(self, path: str) -> Optional[str]:
+        for route, pattern in self.routes:
+            if pattern.match(path):
+                return route
+        return None
+
+    def should_sample(self, request: Request) -> bool:
+        header = request.headers.get(self.debug_header)
+        if header and self.debug_key and hmac.compare_digest(header, self.debug_key):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, method: str, route: str) -> Optional[Profile]:
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = Profile(next(self._ids), method, route)
+        self._sampler = threading.Thread(target=self._sample, args=(profile,), name='request-profiler', daemon=True)
+        self._sampler.start()
+        return profile
+
+    def stop(self, profile: Profile) -> None:
+        profile.duration_ms = (time.time() - profile.started_at) * 1000
+        profile.done.set()
+        # the sampler may be mid-snapshot; publish the profile only once it has stopped writing
+        self._sampler.join()
+        self._sampler = None
+        self._profiles.append(profile)
+        self._busy.release()
+
+    def profiles(self) -> list:
+        return [profile.summary() for profile in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        for profile in self._profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def _sample(self, profile: Profile) -> None:
+        while not profile.done.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            for thread_id in tuple(profile.threads):
+                frame = frames.get(thread_id)
+                stack = []
+                ours = False
+                while frame is not None:
+                    code = frame.f_code
+                    ours = ours or (code.co_filename.startswith(_project_root)
+                                    and 'site-packages' not in code.co_filename)
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                if ours:
+                    profile.stacks[';'.join(reversed(stack))] += 1
+            profile.samples += 1
+
+
+def middleware(app: FastAPI, profiler: RequestProfiler) -> None:
+    @app.middleware('http')
+    async def profile_request(request: Request, call_next):
+        route = profiler.route_for(request.url.path)
+        profile = None
+        if route is not None and profiler.should_sample(request):
+            profile = profiler.start(request.method, route)
+        if profile is None:
+            return await call_next(request)
+        token = _current_profile.set(profile)
+        profile.threads.add(threading.get_ident())
+        try:
+            return await call_next(request)
+        finally:
+            _current_profile.reset(token)
+            profiler.stop(profile)
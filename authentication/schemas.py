@@ -1,4 +1,5 @@
-from typing import Optional
+from datetime import datetime
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -42,8 +43,8 @@ class UpdateInfoRequestModel(BaseModel):
 
 
 class UpdateInfoResponseModel(BaseModel):
-    new_password: str
-    new_email: str
+    new_password: Optional[str] = None
+    new_email: Optional[str] = None
 
 
 class ForgotPasswordRequestModel(BaseModel):
@@ -63,6 +64,75 @@ class ResendPhoneActivationRequestModel(BaseModel):
     phone_number: str
 
 
+class PhoneActivationRequestModel(BaseModel):
+    phone_number: str
+    otp: int
+
+
 class BaseMessage(BaseModel):
     message: str
-    detail: str
\ No newline at end of file
+    detail: str
+
+
+class LoginThrottleStatsResponseModel(BaseModel):
+    tracked_accounts: int
+    tracked_ips: int
+    locked_accounts: int
+    locked_ips: int
+    failures_total: int
+    throttled_total: int
+
+
+class IdentifierIndexStatsResponseModel(BaseModel):
+    ready: bool
+    stale: bool
+    items: int
+    capacity: int
+    false_positive_rate: float
+    num_hashes: int
+    memory_bytes: int
+    last_rebuild_seconds: Optional[float] = None
+    last_sync_age_seconds: Optional[float] = None
+
+
+class HashWorkClassStatsModel(BaseModel):
+    limit: int
+    in_flight: int
+    waiting: int
+    completed: int
+    shed: int
+    avg_wait_ms: float
+    max_wait_ms: float
+    avg_service_ms: float
+
+
+class HashSchedulerStatsResponseModel(BaseModel):
+    queue_depth: int
+    max_queue: int
+    latency_budget_ms: float
+    classes: Dict[str, HashWorkClassStatsModel]
+
+
+class ProfileSummaryModel(BaseModel):
+    id: int
+    method: str
+    route: str
+    started_at: float
+    duration_ms: float
+    samples: int
+
+
+class AdminUserModel(BaseModel):
+    id: int
+    email: Optional[str] = None
+    phone_number: Optional[str] = None
+    is_active: bool
+    email_verified_at: Optional[datetime] = None
+    phone_verified_at: Optional[datetime] = None
+    date_created: Optional[datetime] = None
+    last_login: Optional[datetime] = None
+
+
+class AdminUserPageResponseModel(BaseModel):
+    items: List[AdminUserModel]
+    next_cursor: Optional[str] = None
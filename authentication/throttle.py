@@ -0,0 +1,154 @@
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+from authentication.error_responses import TooManyLoginAttemptsException
+
+
+class _FailureRecord:
+    __slots__ = ('failures', 'locked_until', 'last_failure')
+
+    def __init__(self):
+        self.failures = 0
+        self.locked_until = 0.0
+        self.last_failure = 0.0
+
+
+class LoginThrottle:
+    """
+      Counts failed logins per account and per client ip and locks them out
+      with exponential backoff. Everything lives in process memory, so a
+      throttled attempt is rejected before the user lookup and bcrypt.
+    """
+
+    def __init__(self,
+                 free_attempts: int = 5,
+                 ip_free_attempts: int = 20,
+                 base_lockout_seconds: float = 1.0,
+                 max_lockout_seconds: float = 900.0,
+                 reset_after_seconds: float = 3600.0,
+                 max_entries: int = 100_000):
+        self.free_attempts = free_attempts
+        self.ip_free_attempts = ip_free_attempts
+        self.base_lockout_seconds = base_lockout_seconds
+        self.max_lockout_seconds = max_lockout_seconds
+        self.reset_after_seconds = reset_after_seconds
+        self.max_entries = max_entries
+        self._accounts: Dict[str, _FailureRecord] = {}
+        self._ips: Dict[str, _FailureRecord] = {}
+        self._lock = threading.Lock()
+        self._throttled_total = 0
+        self._failures_total = 0
+
+    @staticmethod
+    def account_key(email: Optional[str] = None, phone_number: Optional[str] = None) -> Optional[str]:
+        if email:
+            return email.strip().lower()
+        return phone_number or None
+
+    def check(self, account: Optional[str], ip: Optional[str]) -> None:
+        """
+          Raises TooManyLoginAttemptsException if the account or the ip is locked out.
+        """
+        now = time.monotonic()
+        retry_after = 0.0
+        with self._lock:
+            for table, key in ((self._accounts, account), (self._ips, ip)):
+                record = self._get(table, key, now)
+                if record and record.locked_until > now:
+                    retry_after = max(retry_after, record.locked_until - now)
+            if retry_after:
+                self._throttled_total += 1
+        if retry_after:
+            raise TooManyLoginAttemptsException(retry_after=math.ceil(retry_after))
+
+    def record_failure(self, account: Optional[str], ip: Optional[str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._failures_total += 1
+            for table, key, free in ((self._accounts, account, self.free_attempts),
+                                     (self._ips, ip, self.ip_free_attempts)):
+                if not key:
+                    continue
+                record = self._get(table, key, now)
+                if record is None:
+                    if len(table) >= self.max_entries:
+                        self._prune(table, now)
+                    record = table[key] = _FailureRecord()
+                record.failures += 1
+                record.last_failure = now
+                if record.failures > free:
+                    lockout = self.base_lockout_seconds * 2 ** (record.failures - free - 1)
+                    record.locked_until = now + min(lockout, self.max_lockout_seconds)
+
+    def record_success(self, account: Optional[str]) -> None:
+        if not account:
+            return
+        with self._lock:
+            self._accounts.pop(account, None)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'tracked_accounts': len(self._accounts),
+                'tracked_ips': len(self._ips),
+                'locked_accounts': sum(1 for r in self._accounts.values() if r.locked_until > now),
+                'locked_ips': sum(1 for r in self._ips.values() if r.locked_until > now),
+                'failures_total': self._failures_total,
+                'throttled_total': self._throttled_total,
+            }
+
+    def _get(self, table: Dict[str, _FailureRecord], key: Optional[str], now: float) -> Optional[_FailureRecord]:
+        if not key:
+            return None
+        record = table.get(key)
+        if record and record.locked_until <= now and now - record.last_failure > self.reset_after_seconds:
+            del table[key]
+            return None
+        return record
+
+    def _prune(self, table: Dict[str, _FailureRecord], now: float) -> None:
+        for key in [k for k, r in table.items()
+                    if r.locked_until <= now and now - r.last_failure > self.reset_after_seconds]:
+            del table[key]
+        if len(table) >= self.max_entries:
+            # still full of live records: drop the oldest half rather than grow unbounded
+            oldest = sorted(table, key=lambda k: table[k].last_failure)[:len(table) // 2]
+            for key in oldest:
+                del table[key]
+
+
+class RequestRateLimiter:
+    """
+      Allows at most `limit` hits per key inside a sliding window of `window_seconds`.
+    """
+
+    def __init__(self, limit: int, window_seconds: float, max_entries: int = 100_000):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._hits: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str) -> bool:
+        """
+          Records a hit for `key` and returns False if it is over the limit.
+        """
+        now = time.monotonic()
+        cutoff = now - self.window_seconds
+        with self._lock:
+            hits = [t for t in self._hits.get(key, ()) if t > cutoff]
+            if len(hits) >= self.limit:
+                self._hits[key] = hits
+                return False
+            if key not in self._hits and len(self._hits) >= self.max_entries:
+                self._prune(cutoff)
+            hits.append(now)
+            self._hits[key] = hits
+            return True
+
+    def _prune(self, cutoff: float) -> None:
+        for key in [k for k, hits in self._hits.items() if not hits or hits[-1] <= cutoff]:
+            del self._hits[key]
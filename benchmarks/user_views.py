@@ -0,0 +1,72 @@
+"""
+  Compares full User entity loads with the column-projected views used on the
+  login and resend hot paths, both looking a user up by email. Reports the best
+  per-lookup latency over a few warmed-up rounds and the memory one lookup
+  allocates at its peak. Runs against an in-memory SQLite database:
+
+      python -m benchmarks.user_views [users] [lookups]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from sql_app.database import Base
+from sql_app.models import User
+from sql_app.user_views import get_login_credentials
+
+
+def full_entity(db, email):
+    user = db.query(User).filter(User.email == email).first()
+    return user.id, user.password, user.is_active
+
+
+def projected(db, email):
+    user = get_login_credentials(db, email=email)
+    return user.id, user.password, user.is_active
+
+
+def measure(name, lookup, db, emails, rounds=5):
+    for email in emails[:200]:
+        lookup(db, email)
+    elapsed = float('inf')
+    for _ in range(rounds):
+        db.expunge_all()
+        start = time.perf_counter()
+        for email in emails:
+            lookup(db, email)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    # peak memory above the starting point while a single lookup runs, i.e. what it allocates
+    db.expunge_all()
+    tracemalloc.start()
+    allocated = 0
+    for email in emails:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        lookup(db, email)
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    print(f'{name:>12}: {elapsed / len(emails) * 1e6:8.1f} us/lookup (best of {rounds}), '
+          f'{allocated / len(emails) / 1024:6.1f} KiB allocated/lookup')
+
+
+def main(users: int = 10_000, lookups: int = 5_000):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'email': f'user{i}@example.com', 'password': '$2b$12$' + 'x' * 53, 'is_active': True}
+            for i in range(users)
+        ])
+    db = sessionmaker(bind=engine)()
+    emails = [f'user{random.randrange(users)}@example.com' for _ in range(lookups)]
+    for name, lookup in (('full entity', full_entity), ('projected', projected)):
+        measure(name, lookup, db, emails)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -1,9 +1,20 @@
-from decouple import config
+from decouple import config, Csv
 
 db_config = {
-    'user': config('DB_USER'),
-    'password': config('DB_PASSWORD'),
-    'host': config('DB_HOST'),
-    'port': config('DB_PORT'),
-    'db': config('DB_NAME'),
-}
\ No newline at end of file
+    'user': config('DB_USER', default=''),
+    'password': config('DB_PASSWORD', default=''),
+    'host': config('DB_HOST', default=''),
+    'port': config('DB_PORT', default=''),
+    'db': config('DB_NAME', default=''),
+}
+
+# full SQLAlchemy urls override the DB_* settings above, e.g. sqlite:///primary.db
+database_url = config('DATABASE_URL', default='')
+replica_urls = config('DATABASE_REPLICA_URLS', default='', cast=Csv())
+# read replicas sharing the primary's credentials and database name, as host[:port]
+replica_urls += [
+    "postgresql://%(user)s:%(password)s@" % db_config
+    + (host if ':' in host else f"{host}:{db_config['port']}") + "/%(db)s" % db_config
+    for host in config('DB_REPLICA_HOSTS', default='', cast=Csv())
+]
+replica_cooldown_seconds = config('DB_REPLICA_COOLDOWN_SECONDS', default=30, cast=float)
@@ -6,9 +6,11 @@ email_conf = ConnectionConfig(
     MAIL_PASSWORD=config('MAIL_PASSWORD'),
     MAIL_FROM=config('MAIL_FROM'),
     MAIL_FROM_NAME=config('MAIL_FROM_NAME'),
-    MAIL_PORT=config('MAIL_PORT'),
+    MAIL_PORT=config('MAIL_PORT', cast=int),
     MAIL_SERVER=config('MAIL_SERVER'),
-    MAIL_TLS=config('MAIL_TLS'),
-    MAIL_SSL=config('MAIL_SSL'),
-    USE_CREDENTIALS=config('USE_CREDENTIALS')
-)
\ No newline at end of file
+    MAIL_STARTTLS=config('MAIL_STARTTLS', default=True, cast=bool),
+    MAIL_SSL_TLS=config('MAIL_SSL_TLS', default=False, cast=bool),
+    USE_CREDENTIALS=config('USE_CREDENTIALS', default=True, cast=bool),
+    # build messages without connecting to the server, e.g. in tests
+    SUPPRESS_SEND=config('MAIL_SUPPRESS_SEND', default=False, cast=bool),
+)
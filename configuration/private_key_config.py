@@ -1,4 +1,7 @@
 from cryptography.hazmat.primitives import serialization
+from decouple import config
 
-with open("../private-key.pem", "rb") as key_file:
-    private_key = key_file.read()
\ No newline at end of file
+with open(config('PRIVATE_KEY_PATH', default='../private-key.pem'), "rb") as key_file:
+    private_key = key_file.read()
+# RS256 tokens are verified with the public half of the signing key
+public_key = serialization.load_pem_private_key(private_key, password=None).public_key()
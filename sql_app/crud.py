@@ -1,15 +1,19 @@
 import random
-import uuid
+from datetime import datetime
+from typing import Optional, Tuple
 
 from decouple import config
 from kavenegar import APIException, HTTPException
+from sqlalchemy import insert, select, literal, DateTime, Integer
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from authentication.auth_utils import send_email
-from authentication.error_responses import InternalServerErrorException, DataBaseIntegrityException
+from authentication.error_responses import (InternalServerErrorException,
+                                            DataBaseIntegrityException,
+                                            UserExistsException)
 from authentication.settings import kavenegarSMSApi
-from sql_app.models import PhoneActivationRequest, EmailActivationRequest, User
+from sql_app.models import PhoneActivationRequest, User
 
 
 def create_model(db: Session, model):
@@ -22,6 +26,67 @@ def create_model(db: Session, model):
     return model
 
 
+USER_UNIQUE_CONSTRAINTS = {
+    'uq_user_email': 'email',
+    'uq_user_phone_number': 'phone_number',
+}
+
+
+def _conflicting_user_field(error: IntegrityError) -> Optional[str]:
+    diag = getattr(error.orig, 'diag', None)
+    constraint = getattr(diag, 'constraint_name', None)
+    if constraint in USER_UNIQUE_CONSTRAINTS:
+        return USER_UNIQUE_CONSTRAINTS[constraint]
+    # drivers without constraint diagnostics (e.g. sqlite) only name the column
+    message = str(error.orig)
+    for field in USER_UNIQUE_CONSTRAINTS.values():
+        if field in message:
+            return field
+    return None
+
+
+def create_user_with_activation_request(db: Session,
+                                        password: str,
+                                        email: Optional[str] = None,
+                                        phone_number: Optional[str] = None) -> Tuple[int, Optional[int]]:
+    """
+      This function inserts a user and, for phone sign-ups, its otp challenge in one transaction.
+      On Postgres both rows go in one statement through a data-modifying CTE; other
+      dialects (e.g. sqlite in tests) do not support that and use two statements.
+      Duplicates are rejected by the unique constraints on user, so concurrent
+      sign-ups can not both succeed. Returns the user id and the otp (None for
+      email sign-ups, whose activation link is signed rather than stored).
+    """
+    now = datetime.utcnow()
+    statement = insert(User).values(
+        password=password,
+        email=email,
+        phone_number=phone_number,
+        is_active=False,
+        date_created=now,
+        date_updated=now,
+    ).returning(User.id)
+    otp = random.randint(10000, 999999) if phone_number else None
+    single_statement = otp is not None and db.get_bind().dialect.name == 'postgresql'
+    if single_statement:
+        new_user = statement.cte('new_user')
+        statement = insert(PhoneActivationRequest).from_select(
+            ['user', 'otp', 'phone_number', 'attempts', 'date_created'],
+            select(new_user.c.id, literal(otp, Integer()), literal(phone_number), literal(0, Integer()),
+                   literal(now, DateTime())),
+        ).returning(PhoneActivationRequest.user).add_cte(new_user)
+    try:
+        user_id = db.execute(statement).scalar_one()
+        if otp is not None and not single_statement:
+            db.execute(insert(PhoneActivationRequest).values(
+                user=user_id, otp=otp, phone_number=phone_number, attempts=0, date_created=now))
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise UserExistsException(field=_conflicting_user_field(e))
+    return user_id, otp
+
+
 def send_otp(db: Session, user_id: int, phone_number: str):
     """
       This function sends an OTP to the user's phone number.
@@ -29,9 +94,18 @@ def send_otp(db: Session, user_id: int, phone_number: str):
     otp = random.randint(10000, 999999)
     model = PhoneActivationRequest(
         user=user_id,
-        otp=otp
+        otp=otp,
+        phone_number=phone_number,
     )
     model = create_model(db, model)
+    error = deliver_otp(phone_number, otp)
+    return error or model
+
+
+def deliver_otp(phone_number: str, otp: int):
+    """
+      This function texts an already stored OTP to the user's phone number.
+    """
     try:
         params = {
             'receptor': phone_number,
@@ -44,63 +118,65 @@ def send_otp(db: Session, user_id: int, phone_number: str):
         return InternalServerErrorException('Error in send_verification_sms')
     except HTTPException as e:
         return InternalServerErrorException('Error in send_verification_sms')
-    return model
 
 
-def send_activation_email(db: Session, user_id: int, email: str):
+async def send_activation_email(email: str, token: str):
     """
       This function sends an activation email to the user's email address.
     """
-    activation_token = uuid.uuid4().hex
-    model = EmailActivationRequest(
-        user=user_id,
-    )
-    model = create_model(db, model)
-    activation_link = f'http://127.0.0.1:8000/users/activation/{activation_token}'
-    send_email(
+    activation_link = f"{config('APP_BASE_URL', default='http://127.0.0.1:8000')}/users/email-activation/{token}"
+    await send_email(
         subject='Verify your email address',
         recipients=[email],
         body=f'to activate your account please click on this link {activation_link}',
     )
 
 
-def send_forgot_password_email(db: Session, user_id: int, email: str):
+async def send_forgot_password_email(email: str, token: str):
     """
       This function sends forgot password email to the user's email address.
     """
-    activation_token = uuid.uuid4().hex
-    model = EmailActivationRequest(
-        user=user_id,
-    )
-    model = create_model(db, model)
-    activation_link = f'http://127.0.0.1:8000/users/reset-password/{activation_token}'
-    send_email(
+    activation_link = f"{config('APP_BASE_URL', default='http://127.0.0.1:8000')}/users/reset-password/{token}"
+    await send_email(
         subject='forgot password email address',
         recipients=[email],
         body=f'to change your password click here {activation_link}',
     )
 
 
-def get_email_activation_request_by_token(db: Session, token: str):
+def get_latest_phone_activation_request(db: Session, phone_number: str):
     """
-      This function gets an email activation request by token.
+      This function gets the newest phone activation request for a phone number
+      through the (phone_number, date_created) index.
     """
-    return db.query(EmailActivationRequest).filter_by(token=token).first()
+    return db.query(PhoneActivationRequest) \
+        .filter_by(phone_number=phone_number) \
+        .order_by(PhoneActivationRequest.date_created.desc()) \
+        .first()
 
 
-def get_phone_activation_request_by_otp(db: Session, otp: int):
+def count_phone_activation_requests_since(db: Session, phone_number: str, since: datetime) -> int:
     """
-      This function gets a phone activation request by otp.
+      This function counts the activation texts sent to a phone number since a point in time.
     """
-    return db.query(PhoneActivationRequest).filter_by(otp=otp).first()
+    return db.query(PhoneActivationRequest) \
+        .filter(PhoneActivationRequest.phone_number == phone_number,
+                PhoneActivationRequest.date_created > since) \
+        .count()
 
 
-def delete_email_activation_request(db: Session, token: str):
+def consume_phone_activation_attempt(db: Session, request_id: int, max_attempts: int) -> bool:
     """
-      This function deletes an email activation request by token.
+      This function atomically uses up one verification attempt of a phone
+      activation request. Returns False once `max_attempts` have been used.
     """
-    db.query(EmailActivationRequest).filter_by(token=token).delete()
+    consumed = db.query(PhoneActivationRequest) \
+        .filter(PhoneActivationRequest.id == request_id,
+                PhoneActivationRequest.attempts < max_attempts) \
+        .update({PhoneActivationRequest.attempts: PhoneActivationRequest.attempts + 1},
+                synchronize_session=False)
     db.commit()
+    return consumed == 1
 
 
 def get_user_by_id(db: Session, user_id: int):
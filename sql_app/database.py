@@ -1,21 +1,135 @@
-from typing import Tuple
-from sqlalchemy import create_engine
+import contextvars
+import itertools
+import time
+from typing import Tuple, List, Optional
+
+from fastapi import FastAPI, Request
+from sqlalchemy import create_engine, Select
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from configuration.database_config import db_config
+from configuration.database_config import db_config, database_url, replica_urls, replica_cooldown_seconds
 
 
 Base = declarative_base()
 
 
-def get_db() -> Tuple[Session, Engine]:
+class _PrimaryPin:
+    __slots__ = ('pinned',)
+
+    def __init__(self):
+        self.pinned = False
+
+
+_request_pin: contextvars.ContextVar[Optional[_PrimaryPin]] = contextvars.ContextVar('primary_pin', default=None)
+_routed_replica: contextvars.ContextVar[Optional[Engine]] = contextvars.ContextVar('routed_replica', default=None)
+
+
+class RoutingSession(Session):
+    """
+      Sends read-only SELECTs to a healthy replica and everything else to the
+      primary. After the first write the current request (or, outside a request,
+      the current transaction) stays pinned to the primary so it reads its own
+      writes. A replica that fails to answer is skipped for `replica_cooldown_seconds`
+      and the statement is retried on the primary.
+    """
+
+    def __init__(self, primary: Engine, replicas: List[Engine] = (), replica_cooldown_seconds: float = 30, **kwargs):
+        kwargs.pop('bind', None)
+        super().__init__(bind=primary, **kwargs)
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.replica_cooldown_seconds = replica_cooldown_seconds
+        self._replica_cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._down_until = {}
+        self._transaction_pin = _PrimaryPin()
+
+    def _pin(self) -> _PrimaryPin:
+        return _request_pin.get() or self._transaction_pin
+
+    def _healthy_replica(self) -> Optional[Engine]:
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            replica = next(self._replica_cycle)
+            if self._down_until.get(replica, 0) <= now:
+                return replica
+        return None
+
+    def reader(self) -> Engine:
+        """
+          Engine for long read-only work outside the session, e.g. exports.
+        """
+        if self.replicas:
+            return self._healthy_replica() or self.primary
+        return self.primary
+
+    def use_primary(self) -> None:
+        """
+          Pins the rest of the current request (or transaction) to the primary, for
+          reads that must not lag behind it such as single-use links and OTP challenges.
+        """
+        self._pin().pinned = True
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        pin = self._pin()
+        if isinstance(clause, Select) and clause._for_update_arg is None and not self._flushing:
+            if self.replicas and not pin.pinned:
+                replica = self._healthy_replica()
+                if replica is not None:
+                    _routed_replica.set(replica)
+                    return replica
+        elif clause is not None or self._flushing:
+            pin.pinned = True
+        return self.primary
+
+    def execute(self, statement, *args, **kwargs):
+        token = _routed_replica.set(None)
+        try:
+            return super().execute(statement, *args, **kwargs)
+        except OperationalError:
+            replica = _routed_replica.get()
+            if replica is None:
+                raise
+            self._down_until[replica] = time.monotonic() + self.replica_cooldown_seconds
+            self._pin().pinned = True
+            return super().execute(statement, *args, **kwargs)
+        finally:
+            _routed_replica.reset(token)
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self._transaction_pin.pinned = False
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._transaction_pin.pinned = False
+
+
+def request_scoped_routing(app: FastAPI) -> None:
+    @app.middleware('http')
+    async def pin_primary_per_request(request: Request, call_next):
+        token = _request_pin.set(_PrimaryPin())
+        try:
+            return await call_next(request)
+        finally:
+            _request_pin.reset(token)
+
+
+def get_db() -> Tuple[RoutingSession, Engine]:
 
-    sqlalchemy_database_url = (
+    sqlalchemy_database_url = database_url or (
             "postgresql://%(user)s:%(password)s@%(host)s:%(port)s/%(db)s" % db_config
     )
     engine = create_engine(sqlalchemy_database_url)
-    local_session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    replicas = [create_engine(url, pool_pre_ping=True) for url in replica_urls]
+    local_session = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False,
+                                 primary=engine, replicas=replicas,
+                                 replica_cooldown_seconds=replica_cooldown_seconds)
 
     db = local_session()
-    return db, engine
\ No newline at end of file
+    return db, engine
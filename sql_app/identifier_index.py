@@ -0,0 +1,232 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import select, func, or_
+from sqlalchemy.engine import Engine
+
+from sql_app.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+      Fixed size Bloom filter sized for `capacity` items at `false_positive_rate`.
+      `count` is the number of distinct items added; adding an item that is already
+      in the filter, or a false positive, does not change it.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> bool:
+        """
+          Returns False if the item was already in the filter.
+        """
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+
+class IdentifierIndex:
+    """
+      In-memory Bloom filter of registered emails and phone numbers. A miss means
+      the identifier is definitely not registered, so callers can skip the database.
+
+      The filter is per process. Every `refresh_interval_seconds` it picks up users
+      created or updated since the previous sync, so identifiers registered by other
+      workers or outside the app become visible within that interval; with refreshing
+      disabled a miss is only trustworthy when this is the sole process writing users.
+      Until the first rebuild finishes, and whenever the last successful sync is older
+      than three sync intervals, every lookup answers "maybe".
+    """
+
+    def __init__(self, capacity: int = 1_000_000, false_positive_rate: float = 0.01,
+                 rebuild_interval_seconds: float = 0, refresh_interval_seconds: float = 0):
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.rebuild_interval_seconds = rebuild_interval_seconds
+        self.refresh_interval_seconds = refresh_interval_seconds
+        sync_interval = refresh_interval_seconds or rebuild_interval_seconds
+        self.max_staleness_seconds = 3 * sync_interval if sync_interval > 0 else None
+        self._filter: Optional[BloomFilter] = None
+        self._pending: Optional[list] = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._last_rebuild_seconds = None
+        self._last_id = 0
+        self._changed_since: Optional[datetime] = None
+        self._synced_at: Optional[float] = None
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _keys(email: Optional[str] = None, phone_number: Optional[str] = None) -> list:
+        keys = []
+        if email:
+            keys.append('e:' + email.strip().lower())
+        if phone_number:
+            keys.append('p:' + phone_number.strip())
+        return keys
+
+    def _stale(self) -> bool:
+        synced_at = self._synced_at
+        return (self.max_staleness_seconds is not None and synced_at is not None
+                and time.monotonic() - synced_at > self.max_staleness_seconds)
+
+    def might_exist(self, email: Optional[str] = None, phone_number: Optional[str] = None) -> bool:
+        bloom = self._filter
+        if bloom is None or self._stale():
+            return True
+        return any(key in bloom for key in self._keys(email, phone_number))
+
+    def add(self, email: Optional[str] = None, phone_number: Optional[str] = None) -> None:
+        keys = self._keys(email, phone_number)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(keys)
+            if self._filter is not None:
+                for key in keys:
+                    self._filter.add(key)
+
+    def _mark_synced(self, started: datetime, last_id: int) -> None:
+        # overlap the next sync window so rows committed just after this read are not missed
+        self._changed_since = started - timedelta(seconds=max(self.refresh_interval_seconds, 1))
+        self._last_id = max(self._last_id, last_id)
+        self._synced_at = time.monotonic()
+
+    def rebuild(self, engine: Engine) -> dict:
+        """
+          Rebuilds the filter from the user table and swaps it in atomically.
+        """
+        with self._rebuild_lock:
+            started = time.monotonic()
+            started_at = datetime.utcnow()
+            last_id = 0
+            with self._lock:
+                self._pending = []
+            try:
+                with engine.connect() as connection:
+                    users = connection.execute(select(func.count()).select_from(User)).scalar_one()
+                    # each user contributes up to two keys; leave headroom for sign-ups until the next rebuild
+                    bloom = BloomFilter(max(self.capacity, 4 * users), self.false_positive_rate)
+                    rows = connection.execution_options(stream_results=True, yield_per=10_000).execute(
+                        select(User.id, User.email, User.phone_number))
+                    for user_id, email, phone_number in rows:
+                        last_id = max(last_id, user_id)
+                        for key in self._keys(email, phone_number):
+                            bloom.add(key)
+                with self._lock:
+                    for key in self._pending:
+                        bloom.add(key)
+                    self._filter = bloom
+                    self._last_id = 0
+                    self._mark_synced(started_at, last_id)
+            finally:
+                with self._lock:
+                    self._pending = None
+            self._last_rebuild_seconds = time.monotonic() - started
+        return self.stats()
+
+    def refresh(self, engine: Engine) -> int:
+        """
+          Adds users created or updated since the previous sync and returns how many
+          were read. Falls back to a full rebuild before the first one has run.
+        """
+        if self._filter is None:
+            self.rebuild(engine)
+            return 0
+        with self._rebuild_lock:
+            started_at = datetime.utcnow()
+            since = self._changed_since
+            with engine.connect() as connection:
+                rows = connection.execute(
+                    select(User.id, User.email, User.phone_number)
+                    .where(or_(User.id > self._last_id, User.date_created >= since, User.date_updated >= since))
+                ).all()
+            last_id = 0
+            with self._lock:
+                for user_id, email, phone_number in rows:
+                    last_id = max(last_id, user_id)
+                    for key in self._keys(email, phone_number):
+                        self._filter.add(key)
+                self._mark_synced(started_at, last_id)
+        return len(rows)
+
+    def start_background_sync(self, engine: Engine) -> None:
+        """
+          Refreshes the filter every `refresh_interval_seconds` and rebuilds it, which
+          also drops deleted identifiers and resizes it, every `rebuild_interval_seconds`.
+        """
+        if self._thread is not None or (self.refresh_interval_seconds <= 0 and self.rebuild_interval_seconds <= 0):
+            return
+
+        def run():
+            next_rebuild = time.monotonic() + self.rebuild_interval_seconds
+            interval = self.refresh_interval_seconds if self.refresh_interval_seconds > 0 \
+                else self.rebuild_interval_seconds
+            while not self._stopping.wait(interval):
+                try:
+                    if self.rebuild_interval_seconds > 0 and time.monotonic() >= next_rebuild:
+                        next_rebuild = time.monotonic() + self.rebuild_interval_seconds
+                        self.rebuild(engine)
+                    elif self.refresh_interval_seconds > 0:
+                        self.refresh(engine)
+                except Exception:
+                    logger.exception('identifier index sync failed')
+
+        self._stopping.clear()
+        self._thread = threading.Thread(target=run, name='identifier-index-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def stats(self) -> dict:
+        bloom = self._filter
+        return {
+            'ready': bloom is not None,
+            'stale': self._stale(),
+            'items': bloom.count if bloom else 0,
+            'capacity': bloom.capacity if bloom else self.capacity,
+            'false_positive_rate': self.false_positive_rate,
+            'num_hashes': bloom.num_hashes if bloom else 0,
+            'memory_bytes': bloom.memory_bytes if bloom else 0,
+            'last_rebuild_seconds': self._last_rebuild_seconds,
+            'last_sync_age_seconds': time.monotonic() - self._synced_at if self._synced_at else None,
+        }
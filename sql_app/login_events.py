@@ -0,0 +1,158 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import bindparam
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DataError, IntegrityError
+
+from sql_app.models import LoginEvent, User
+
+logger = logging.getLogger(__name__)
+
+
+class LoginOutcome:
+    SUCCESS = 'success'
+    UNKNOWN_USER = 'unknown_user'
+    INVALID_CREDENTIALS = 'invalid_credentials'
+    THROTTLED = 'throttled'
+
+
+class LoginEventBuffer:
+    """
+      Write-behind buffer for login audit events and user.last_login. Events are
+      collected in memory and written by a background thread in one executemany
+      per table whenever `batch_size` events are pending or `flush_interval_seconds`
+      has passed. last_login updates are coalesced to the latest login per user.
+      A batch that fails for a transient reason is retried on the next flush; one
+      the database rejects is written row by row and the rejected rows are dropped.
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval_seconds: float = 1.0, max_pending: int = 100_000):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self._events = []
+        self._last_logins = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._engine: Optional[Engine] = None
+        self._thread = None
+        self.dropped = 0
+        self.rejected = 0
+
+    def start(self, engine: Engine) -> None:
+        if self._thread is not None:
+            return
+        self._engine = engine
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='login-event-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+          Stops the writer thread and drains whatever is still buffered.
+        """
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def record(self, outcome: str, user_id: Optional[int] = None, identifier: Optional[str] = None,
+               ip: Optional[str] = None) -> None:
+        now = datetime.utcnow()
+        with self._lock:
+            if len(self._events) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._events.append({
+                'user': user_id,
+                'identifier': identifier[:50] if identifier else None,
+                'ip': ip,
+                'outcome': outcome,
+                'date_created': now,
+            })
+            if outcome == LoginOutcome.SUCCESS and user_id is not None:
+                self._last_logins[user_id] = now
+            pending = len(self._events)
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            # before start() there is nowhere to write; keep the events for the first flush
+            if self._engine is None:
+                return 0
+            with self._lock:
+                events, self._events = self._events, []
+                last_logins, self._last_logins = self._last_logins, {}
+            if not events:
+                return 0
+            try:
+                self._write(events, last_logins)
+            except (IntegrityError, DataError):
+                logger.warning('login event batch rejected, writing its %d events one by one', len(events))
+                return self._write_one_by_one(events, last_logins)
+            except Exception:
+                logger.exception('failed to write %d login events', len(events))
+                self._requeue(events, last_logins)
+                return 0
+            return len(events)
+
+    def _write(self, events: list, last_logins: dict) -> None:
+        with self._engine.begin() as connection:
+            if events:
+                connection.execute(LoginEvent.__table__.insert(), events)
+            if last_logins:
+                connection.execute(
+                    User.__table__.update()
+                    .where(User.__table__.c.id == bindparam('b_user'))
+                    .values(last_login=bindparam('b_last_login')),
+                    [{'b_user': user, 'b_last_login': at} for user, at in last_logins.items()],
+                )
+
+    def _write_one_by_one(self, events: list, last_logins: dict) -> int:
+        """
+          Isolates the rows the database will never accept, e.g. an event whose user
+          was deleted, so they are dropped instead of blocking every later batch.
+        """
+        written = 0
+        for position, event in enumerate(events):
+            try:
+                self._write([event], {})
+            except (IntegrityError, DataError) as e:
+                self.rejected += 1
+                logger.warning('dropping %s login event of user %s: %s', event['outcome'], event['user'], e.orig)
+            except Exception:
+                logger.exception('failed to write %d login events', len(events) - position)
+                self._requeue(events[position:], last_logins)
+                return written
+            else:
+                written += 1
+        try:
+            self._write([], last_logins)
+        except Exception:
+            logger.exception('failed to update last_login of %d users', len(last_logins))
+            self._requeue([], last_logins)
+        return written
+
+    def _requeue(self, events: list, last_logins: dict) -> None:
+        with self._lock:
+            room = self.max_pending - len(self._events)
+            self.dropped += max(0, len(events) - room)
+            self._events[:0] = events[-room:] if room > 0 else []
+            for user, at in last_logins.items():
+                if self._last_logins.get(user, at) <= at:
+                    self._last_logins[user] = at
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            self.flush()
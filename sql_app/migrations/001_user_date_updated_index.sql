@@ -0,0 +1,3 @@
+-- create_all does not add indexes to an existing table.
+-- Lets the identifier index refresh find users whose email or phone number changed.
+CREATE INDEX IF NOT EXISTS ix_user_date_updated ON "user" (date_updated);
@@ -0,0 +1,8 @@
+-- create_all does not add constraints to an existing table.
+-- Registration relies on these to reject concurrent sign-ups with the same email or phone number.
+-- Adding them fails while duplicates exist. List them with
+--   SELECT email, array_agg(id ORDER BY id) FROM "user" WHERE email IS NOT NULL GROUP BY email HAVING count(*) > 1;
+--   SELECT phone_number, array_agg(id ORDER BY id) FROM "user" WHERE phone_number IS NOT NULL GROUP BY phone_number HAVING count(*) > 1;
+-- and merge or delete the extra accounts before running this script.
+ALTER TABLE "user" ADD CONSTRAINT uq_user_email UNIQUE (email);
+ALTER TABLE "user" ADD CONSTRAINT uq_user_phone_number UNIQUE (phone_number);
@@ -0,0 +1,5 @@
+-- create_all does not add indexes to an existing table.
+-- Keyset pagination for the admin user search and its unverified filters.
+CREATE INDEX IF NOT EXISTS ix_user_date_created_id ON "user" (date_created, id);
+CREATE INDEX IF NOT EXISTS ix_user_email_unverified ON "user" (date_created, id) WHERE email_verified_at IS NULL;
+CREATE INDEX IF NOT EXISTS ix_user_phone_unverified ON "user" (date_created, id) WHERE phone_verified_at IS NULL;
@@ -0,0 +1,11 @@
+-- create_all does not add columns or indexes to an existing table.
+-- Phone activation looks challenges up by phone number and counts the attempts made on each.
+ALTER TABLE phone_activation_request ADD COLUMN IF NOT EXISTS phone_number VARCHAR(11);
+UPDATE phone_activation_request r SET phone_number = u.phone_number
+  FROM "user" u WHERE u.id = r."user" AND r.phone_number IS NULL;
+-- challenges of users that no longer have a phone number can not be verified anymore
+DELETE FROM phone_activation_request WHERE phone_number IS NULL;
+ALTER TABLE phone_activation_request ALTER COLUMN phone_number SET NOT NULL;
+ALTER TABLE phone_activation_request ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS ix_phone_activation_request_phone_created
+  ON phone_activation_request (phone_number, date_created);
@@ -1,13 +1,24 @@
-import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, ForeignKey, DateTime, Integer, Boolean
+from sqlalchemy import Column, String, ForeignKey, DateTime, Integer, Boolean, UniqueConstraint, Index, text
 
 from sql_app.database import Base
 
 
 class User(Base):
     __tablename__ = "user"
+    __table_args__ = (
+        UniqueConstraint('email', name='uq_user_email'),
+        UniqueConstraint('phone_number', name='uq_user_phone_number'),
+        # keyset pagination for the admin user search, plus partial indexes for the unverified filters
+        Index('ix_user_date_created_id', 'date_created', 'id'),
+        Index('ix_user_email_unverified', 'date_created', 'id',
+              postgresql_where=text('email_verified_at IS NULL')),
+        Index('ix_user_phone_unverified', 'date_created', 'id',
+              postgresql_where=text('phone_verified_at IS NULL')),
+        # incremental refresh of the identifier index
+        Index('ix_user_date_updated', 'date_updated'),
+    )
     id = Column(Integer(), primary_key=True)
     phone_number = Column(String(length=11), nullable=True)
     email = Column(String(length=50), nullable=True)
@@ -28,27 +39,31 @@ class User(Base):
         self.date_updated = datetime.utcnow()
 
 
-class EmailActivationRequest(Base):
-    __tablename__ = "email_activation_request"
-    id = Column(Integer(), primary_key=True)
-    token = Column(String(length=50), nullable=False)
-    user = Column(Integer(), ForeignKey("user.id"), nullable=False)
-    date_created = Column(DateTime(timezone=False))
-
-    def __init__(self, user):
-        self.user = user
-        self.token = uuid.uuid4().hex
-        self.date_created = datetime.utcnow()
-
-
 class PhoneActivationRequest(Base):
     __tablename__ = "phone_activation_request"
+    __table_args__ = (
+        Index('ix_phone_activation_request_phone_created', 'phone_number', 'date_created'),
+    )
     id = Column(Integer(), primary_key=True)
     otp = Column(Integer(), nullable=False)
     user = Column(Integer(), ForeignKey("user.id"), nullable=False)
+    phone_number = Column(String(length=11), nullable=False)
+    attempts = Column(Integer(), nullable=False, default=0)
     date_created = Column(DateTime(timezone=True))
 
-    def __init__(self, user: int, otp: int):
+    def __init__(self, user: int, otp: int, phone_number: str):
         self.otp = otp
         self.user = user
-        self.date_created = datetime.utcnow()
\ No newline at end of file
+        self.phone_number = phone_number
+        self.attempts = 0
+        self.date_created = datetime.utcnow()
+
+
+class LoginEvent(Base):
+    __tablename__ = "login_event"
+    id = Column(Integer(), primary_key=True)
+    user = Column(Integer(), ForeignKey("user.id"), nullable=True, index=True)
+    identifier = Column(String(length=50), nullable=True)
+    ip = Column(String(length=45), nullable=True)
+    outcome = Column(String(length=20), nullable=False)
+    date_created = Column(DateTime(), nullable=False, index=True)
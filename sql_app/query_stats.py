@@ -0,0 +1,132 @@
+import contextvars
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import compile_path
+
+logger = logging.getLogger(__name__)
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_in_lists = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_params = re.compile(r'%\(\w+\)s|:\w+|\$\d+')
+_whitespace = re.compile(r'\s+')
+
+
+def normalize(statement: str) -> str:
+    """
+      Replaces literals and bind parameters with ? so that statements that only
+      differ in their values share a fingerprint.
+    """
+    statement = _params.sub('?', statement)
+    statement = _literals.sub('?', statement)
+    statement = _in_lists.sub('(?)', statement)
+    return _whitespace.sub(' ', statement).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+class QueryStats:
+    __slots__ = ('count', 'seconds', 'fingerprints', 'statements', 'parent')
+
+    def __init__(self, parent: Optional['QueryStats'] = None):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+        self.statements = {}
+        self.parent = parent
+
+    def record(self, statement: str, seconds: float) -> None:
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        stats = self
+        # a request tracked inside a test's query_budget block counts towards both
+        while stats is not None:
+            stats.count += 1
+            stats.seconds += seconds
+            stats.fingerprints[key] += 1
+            stats.statements.setdefault(key, normalized)
+            stats = stats.parent
+
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, stats: QueryStats, max_queries: int, label: str = ''):
+        self.stats = stats
+        self.max_queries = max_queries
+        details = ''.join(f'\n  {count} x [{key}] {stats.statements[key]}'
+                          for key, count in stats.fingerprints.most_common())
+        super().__init__(f'{label or "block"} ran {stats.count} queries, budget is {max_queries}:{details}')
+
+
+_current: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar('query_stats', default=None)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None and conn.info.get('query_started'):
+        stats.record(statement, time.perf_counter() - conn.info['query_started'].pop())
+
+
+@contextmanager
+def track_queries():
+    """
+      Counts and times every statement executed in the current context,
+      including sync handlers running in the threadpool. Nested blocks also
+      count towards the enclosing ones.
+    """
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = ''):
+    """
+      Raises QueryBudgetExceeded when the block runs more than `max_queries` statements.
+      Used by the `query_budget` fixture in tests/conftest.py around TestClient requests.
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(stats, max_queries, label)
+
+
+def middleware(app: FastAPI, budgets: Dict[str, int], enforce: bool = False) -> None:
+    routes = [(route, compile_path(route)[0]) for route in budgets]
+
+    @app.middleware('http')
+    async def track_request_queries(request: Request, call_next):
+        with track_queries() as stats:
+            response = await call_next(request)
+        route = next((route for route, pattern in routes if pattern.match(request.url.path)), None)
+        logger.info('%s %s: %d queries, %.1f ms in db', request.method, request.url.path,
+                    stats.count, stats.seconds * 1000)
+        for key, count in stats.fingerprints.most_common():
+            logger.debug('  %d x [%s] %s', count, key, stats.statements[key])
+        response.headers['X-DB-Query-Count'] = str(stats.count)
+        response.headers['X-DB-Time-Ms'] = f'{stats.seconds * 1000:.1f}'
+        if route is not None and stats.count > budgets[route]:
+            error = QueryBudgetExceeded(stats, budgets[route], f'{request.method} {route}')
+            if enforce:
+                raise error
+            logger.warning(str(error))
+        return response
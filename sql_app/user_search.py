@@ -0,0 +1,116 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select, tuple_, Select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from sql_app.models import User
+
+
+class AdminUserRow(NamedTuple):
+    id: int
+    email: Optional[str]
+    phone_number: Optional[str]
+    is_active: bool
+    email_verified_at: Optional[datetime]
+    phone_verified_at: Optional[datetime]
+    date_created: Optional[datetime]
+    last_login: Optional[datetime]
+
+    def as_dict(self) -> dict:
+        return {field: value.isoformat() if isinstance(value, datetime) else value
+                for field, value in zip(self._fields, self)}
+
+
+def encode_cursor(row: AdminUserRow) -> str:
+    """
+      A cursor with an empty date is in the second phase, the users without date_created.
+    """
+    date_created = row.date_created.isoformat() if row.date_created else ''
+    return base64.urlsafe_b64encode(f'{date_created}|{row.id}'.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """
+      Raises ValueError for a cursor that was not produced by encode_cursor.
+    """
+    date_created, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(date_created) if date_created else None, int(user_id)
+
+
+def search_statement(email_verified: Optional[bool] = None,
+                     phone_verified: Optional[bool] = None,
+                     created_after: Optional[datetime] = None,
+                     created_before: Optional[datetime] = None) -> Select:
+    """
+      This function builds the filtered user query ordered by the (date_created, id) index.
+      Users without date_created come last, as they do in that index on Postgres.
+    """
+    statement = select(*(getattr(User, field) for field in AdminUserRow._fields))
+    if email_verified is not None:
+        statement = statement.where(User.email_verified_at.isnot(None) if email_verified
+                                    else User.email_verified_at.is_(None))
+    if phone_verified is not None:
+        statement = statement.where(User.phone_verified_at.isnot(None) if phone_verified
+                                    else User.phone_verified_at.is_(None))
+    if created_after is not None:
+        statement = statement.where(User.date_created >= created_after)
+    if created_before is not None:
+        statement = statement.where(User.date_created < created_before)
+    return statement.order_by(User.date_created.asc().nulls_last(), User.id)
+
+
+def _fetch(db: Session, statement: Select, limit: int) -> List[AdminUserRow]:
+    return [AdminUserRow._make(row) for row in db.execute(statement.limit(limit))]
+
+
+def search_users(db: Session, statement: Select, cursor: Optional[str] = None,
+                 limit: int = 100) -> Tuple[List[AdminUserRow], Optional[str]]:
+    """
+      This function returns one keyset page and the cursor of the next one.
+
+      It pages in two phases so that each query is a range scan of the (date_created, id)
+      index: first the dated users by (date_created, id), then the users without
+      date_created by id. An OR of both conditions can not use the index as a range.
+    """
+    dated = statement.order_by(None).where(User.date_created.isnot(None)).order_by(User.date_created, User.id)
+    undated = statement.order_by(None).where(User.date_created.is_(None)).order_by(User.id)
+    date_created, user_id = decode_cursor(cursor) if cursor else (None, None)
+    if cursor and date_created is None:
+        rows = _fetch(db, undated.where(User.id > user_id), limit + 1)
+    else:
+        if cursor:
+            dated = dated.where(tuple_(User.date_created, User.id) > (date_created, user_id))
+        rows = _fetch(db, dated, limit + 1)
+        if len(rows) <= limit:
+            rows += _fetch(db, undated, limit + 1 - len(rows))
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def export_users(engine: Engine, statement: Select, export_format: str = 'ndjson',
+                 batch_size: int = 1000) -> Iterator[str]:
+    """
+      This function streams every matching user through a server-side cursor,
+      one batch in memory at a time, as NDJSON lines or CSV.
+    """
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(statement)
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(AdminUserRow._fields)
+            for rows in result.partitions():
+                writer.writerows(AdminUserRow._make(row).as_dict().values() for row in rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for rows in result.partitions():
+                yield ''.join(json.dumps(AdminUserRow._make(row).as_dict()) + '\n' for row in rows)
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, or_
+from sqlalchemy.orm import Session
+
+from sql_app.models import User
+
+
+class UserCredentials(NamedTuple):
+    id: int
+    password: str
+    is_active: bool
+
+
+class UserEmailContact(NamedTuple):
+    id: int
+    email: str
+    email_verified_at: Optional[datetime]
+    password: str
+
+
+class UserPhoneContact(NamedTuple):
+    id: int
+    phone_number: str
+    phone_verified_at: Optional[datetime]
+
+
+def _identifier_filter(email: Optional[str] = None, phone_number: Optional[str] = None):
+    conditions = []
+    if email:
+        conditions.append(User.email == email)
+    if phone_number:
+        conditions.append(User.phone_number == phone_number)
+    return or_(*conditions) if conditions else None
+
+
+def get_login_credentials(db: Session, email: Optional[str] = None,
+                          phone_number: Optional[str] = None) -> Optional[UserCredentials]:
+    """
+      This function loads only the columns login needs, without ORM identity tracking.
+    """
+    condition = _identifier_filter(email, phone_number)
+    if condition is None:
+        return None
+    row = db.execute(select(User.id, User.password, User.is_active).where(condition).limit(1)).first()
+    return UserCredentials._make(row) if row else None
+
+
+def get_email_contact(db: Session, email: str) -> Optional[UserEmailContact]:
+    """
+      This function loads the columns the email activation and reset flows need.
+    """
+    row = db.execute(select(User.id, User.email, User.email_verified_at, User.password)
+                     .where(User.email == email).limit(1)).first()
+    return UserEmailContact._make(row) if row else None
+
+
+def get_phone_contact(db: Session, phone_number: str) -> Optional[UserPhoneContact]:
+    """
+      This function loads the columns the phone activation flow needs.
+    """
+    row = db.execute(select(User.id, User.phone_number, User.phone_verified_at)
+                     .where(User.phone_number == phone_number).limit(1)).first()
+    return UserPhoneContact._make(row) if row else None
+
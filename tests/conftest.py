@@ -0,0 +1,127 @@
+import os
+import tempfile
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+_key_dir = tempfile.mkdtemp()
+_key_path = os.path.join(_key_dir, 'private-key.pem')
+with open(_key_path, 'wb') as key_file:
+    key_file.write(rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+
+# settings are read at import time, so they have to be in place before the app is imported
+for name, value in {
+    'PRIVATE_KEY_PATH': _key_path,
+    'JWT_ALGORITHM': 'RS256',
+    'JWT_ACCESS_EXP_HOURS': '1',
+    'JWT_REFRESH_EXP_HOURS': '5',
+    'SIGNED_LINK_SECRET': 'test-secret',
+    'ADMIN_API_KEY': 'test-admin-key',
+    'KAVENEGAR_API_KEY': 'test',
+    'KAVENEGAR_VERIFICATION_TEMPLATE_NAME': 'verification',
+    'EMAIL_ACTIVATION_EXP_MINUTES': '20',
+    'PHONE_ACTIVATION_EXP_MINUTES': '10',
+    'EMAIL_ACTIVATION_LIMIT': '2',
+    'PHONE_ACTIVATION_LIMIT': '2',
+    'MAIL_USERNAME': 'test',
+    'MAIL_PASSWORD': 'test',
+    'MAIL_FROM': 'noreply@example.com',
+    'MAIL_FROM_NAME': 'test',
+    'MAIL_PORT': '25',
+    'MAIL_SERVER': 'localhost',
+    'MAIL_SUPPRESS_SEND': 'True',
+}.items():
+    os.environ.setdefault(name, value)
+
+import pytest  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from authentication import auth  # noqa: E402
+from authentication.main import setup  # noqa: E402
+from authentication.settings import kavenegarSMSApi  # noqa: E402
+from sql_app import query_stats  # noqa: E402
+from sql_app.database import Base, RoutingSession  # noqa: E402
+from sql_app.models import User  # noqa: E402
+
+PASSWORD = 'correct horse battery'
+
+
+def sqlite_engine(path):
+    engine = create_engine(f'sqlite:///{path}', connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlite_engine(tmp_path / 'primary.db')
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def replicas():
+    """
+      Replica engines for the session; tests that need them override this fixture.
+    """
+    return []
+
+
+@pytest.fixture
+def db(engine, replicas):
+    session = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False,
+                           primary=engine, replicas=replicas)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    setup(app, db)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def sms(monkeypatch):
+    """
+      Texts sent through kavenegar, captured instead of delivered.
+    """
+    sent = []
+    monkeypatch.setattr(kavenegarSMSApi, 'verify_lookup', sent.append)
+    return sent
+
+
+@pytest.fixture
+def create_user(db):
+    def create(email=None, phone_number=None, password=PASSWORD, active=True) -> User:
+        user = User(password=auth.auth_handler.pwd_context.hash(password), email=email, phone_number=phone_number)
+        if active:
+            user.is_active = True
+            user.email_verified_at = user.date_created if email else None
+            user.phone_verified_at = user.date_created if phone_number else None
+        db.add(user)
+        db.flush()
+        # detached, so reading it does not refresh it from a replica that lacks the row
+        db.expunge(user)
+        db.commit()
+        auth.identifier_index.add(email=email, phone_number=phone_number)
+        return user
+    return create
+
+
+@pytest.fixture
+def query_budget():
+    """
+      `with query_budget(AuthRoutes.user_login): client.post(...)` fails the test with
+      QueryBudgetExceeded, listing the statements, when the requests in the block run
+      more queries than the route's budget in auth.QUERY_BUDGETS.
+    """
+    def within(route: str):
+        return query_stats.query_budget(auth.QUERY_BUDGETS[route], label=route)
+    return within
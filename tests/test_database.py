@@ -0,0 +1,124 @@
+import shutil
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from authentication.auth import AuthRoutes, signed_links
+from authentication.signed_links import SignedLinkHandler
+from sql_app.database import RoutingSession
+from sql_app.models import User
+from tests.conftest import PASSWORD, sqlite_engine
+
+
+@pytest.fixture
+def replica(tmp_path):
+    replica = sqlite_engine(tmp_path / 'replica.db')
+    yield replica
+    replica.dispose()
+
+
+@pytest.fixture
+def replicas(replica):
+    return [replica]
+
+
+def catch_up(primary, replica):
+    """
+      Replicates by copying the primary's file over the replica's.
+    """
+    replica.dispose()
+    shutil.copyfile(primary.url.database, replica.url.database)
+
+
+def email_of(db, user_id):
+    return db.execute(select(User.email).where(User.id == user_id)).scalar()
+
+
+def test_reads_go_to_the_replica_until_a_write(db, engine, replica):
+    with engine.begin() as connection:
+        user_id = connection.execute(User.__table__.insert().values(email='lag@example.com', password='x',
+                                                                    is_active=False)).inserted_primary_key[0]
+    assert email_of(db, user_id) is None
+
+    db.add(User(password='x', email='other@example.com'))
+    db.flush()
+    assert email_of(db, user_id) == 'lag@example.com'
+
+    db.commit()
+    assert email_of(db, user_id) is None
+    catch_up(engine, replica)
+    assert email_of(db, user_id) == 'lag@example.com'
+
+
+def test_use_primary(db, engine):
+    with engine.begin() as connection:
+        user_id = connection.execute(User.__table__.insert().values(email='pin@example.com', password='x',
+                                                                    is_active=False)).inserted_primary_key[0]
+    db.use_primary()
+    assert email_of(db, user_id) == 'pin@example.com'
+    db.rollback()
+    assert email_of(db, user_id) is None
+
+
+def test_falls_back_to_the_primary_when_a_replica_is_down(engine, tmp_path):
+    down = create_engine(f'sqlite:///{tmp_path}/missing/replica.db')
+    db = sessionmaker(class_=RoutingSession, primary=engine, replicas=[down], replica_cooldown_seconds=60)()
+    with engine.begin() as connection:
+        user_id = connection.execute(User.__table__.insert().values(email='down@example.com', password='x',
+                                                                    is_active=False)).inserted_primary_key[0]
+    assert email_of(db, user_id) == 'down@example.com'
+    assert db.reader() is engine
+    db.close()
+
+
+def test_phone_activation_reads_the_latest_challenge_from_the_primary(client, engine, replica, sms):
+    client.post(AuthRoutes.user_register, json={'phone_number': '09120000010', 'password': PASSWORD,
+                                                're_password': PASSWORD})
+    catch_up(engine, replica)
+    response = client.post(AuthRoutes.user_resend_phone_activation, json={'phone_number': '09120000010'})
+    assert response.status_code == 200, response.text
+
+    response = client.post(AuthRoutes.user_phone_activation,
+                           json={'phone_number': '09120000010', 'otp': sms[-1]['token']})
+    assert response.status_code == 200, response.text
+
+
+def test_reset_link_can_not_be_replayed_against_a_lagging_replica(client, create_user, engine, replica):
+    user = create_user(email='replay@example.com')
+    token = signed_links.create(SignedLinkHandler.RESET_PASSWORD, user, expires_in=timedelta(minutes=5))
+    catch_up(engine, replica)
+    path = AuthRoutes.user_reset_password.format(token=token)
+
+    response = client.post(path, json={'password': 'first new password', 're_password': 'first new password'})
+    assert response.status_code == 200, response.text
+    response = client.post(path, json={'password': 'second new password', 're_password': 'second new password'})
+    assert response.status_code == 400, response.text
+
+
+def test_email_activation_reads_the_user_from_the_primary(client, create_user):
+    user = create_user(email='fresh@example.com', active=False)
+    token = signed_links.create(SignedLinkHandler.EMAIL_ACTIVATION, user, expires_in=timedelta(minutes=5))
+    response = client.post(AuthRoutes.user_email_activation.format(token=token))
+    assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize('method', ['patch', 'put'])
+def test_update_info_checks_the_old_password_on_the_primary(client, create_user, engine, replica, method):
+    user = create_user(email=f'{method}-lag@example.com')
+    catch_up(engine, replica)
+    response = client.post(AuthRoutes.user_login, json={'email': f'{method}-lag@example.com', 'password': PASSWORD})
+    assert response.status_code == 200, response.text
+    access = response.json()['access']
+    token = signed_links.create(SignedLinkHandler.RESET_PASSWORD, user, expires_in=timedelta(minutes=5))
+    response = client.post(AuthRoutes.user_reset_password.format(token=token),
+                           json={'password': 'reset password', 're_password': 'reset password'})
+    assert response.status_code == 200, response.text
+
+    response = client.request(method, AuthRoutes.user_update_info,
+                              json={'old_password': PASSWORD, 'email': f'{method}-lag@example.com',
+                                    'new_password': 'attacker password'},
+                              headers={'Authorization': f'Bearer {access}'})
+    assert response.status_code == 400, response.text
+    assert response.json()['message'] == 'old password was not entered correctly'
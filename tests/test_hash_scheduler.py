@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from authentication import auth
+from authentication.auth import AuthRoutes
+from authentication.error_responses import ServiceOverloadedException
+from authentication.hash_scheduler import HashScheduler, WorkClass
+from tests.conftest import PASSWORD
+
+
+class BlockingContext:
+    """
+      Stands in for the passlib context; verify blocks until released.
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.threads = set()
+
+    def verify(self, plain_password, hashed_password):
+        self.threads.add(threading.get_ident())
+        self.release.wait(10)
+        return True
+
+
+def test_sheds_work_beyond_the_queue():
+    scheduler = HashScheduler({WorkClass.LOGIN: 1}, max_queue=1, latency_budget_seconds=10)
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        running = pool.submit(scheduler.run, WorkClass.LOGIN, release.wait, 10)
+        queued = pool.submit(scheduler.run, WorkClass.LOGIN, lambda: 'queued')
+        while scheduler.stats()['queue_depth'] < 1:
+            time.sleep(0.01)
+        with pytest.raises(ServiceOverloadedException):
+            scheduler.run(WorkClass.LOGIN, lambda: 'shed')
+        release.set()
+        assert running.result() and queued.result() == 'queued'
+    stats = scheduler.stats()['classes'][WorkClass.LOGIN]
+    assert (stats['completed'], stats['shed']) == (2, 1)
+    assert scheduler.max_threads == 2
+
+
+def test_a_login_burst_holds_only_the_threads_the_scheduler_admits(client, create_user, monkeypatch):
+    create_user(email='burst@example.com')
+    scheduler = HashScheduler({WorkClass.LOGIN: 1}, max_queue=1, latency_budget_seconds=10)
+    context = BlockingContext()
+    monkeypatch.setattr(auth.auth_handler, 'scheduler', scheduler)
+    monkeypatch.setattr(auth.auth_handler, 'pwd_context', context)
+
+    def login():
+        return client.post(AuthRoutes.user_login, json={'email': 'burst@example.com', 'password': PASSWORD})
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        logins = [pool.submit(login) for _ in range(12)]
+        deadline = time.monotonic() + 5
+        while scheduler.stats()['classes'][WorkClass.LOGIN]['shed'] < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(context.threads) == 1
+
+        refresh = pool.submit(client.post, AuthRoutes.user_refresh_token,
+                              json={'refresh': auth.auth_handler.encode_token(user_id=1, access_token=False)})
+        assert refresh.result(timeout=5).status_code == 200
+        context.release.set()
+        statuses = sorted(future.result().status_code for future in logins)
+    assert statuses == [200, 200] + [503] * 10
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from authentication import auth
+from authentication.auth import AuthRoutes
+from authentication.error_responses import ServiceOverloadedException
+from authentication.idempotency import LocalIdempotencyStore, StoredResponse
+from tests.conftest import PASSWORD
+
+RESPONSE = StoredResponse(200, [], b'{}')
+
+
+def test_local_store_evicts_the_oldest_responses_when_full_of_live_keys():
+    async def fill():
+        store = LocalIdempotencyStore(ttl_seconds=86400, max_entries=10)
+        for i in range(10):
+            assert await store.acquire(f'done-{i}', 'fp', wait_seconds=1) is None
+            await store.complete(f'done-{i}', 'fp', RESPONSE)
+        assert await store.acquire('in-flight', 'fp', wait_seconds=1) is None
+        for i in range(20):
+            assert await store.acquire(f'more-{i}', 'fp', wait_seconds=1) is None
+            await store.complete(f'more-{i}', 'fp', RESPONSE)
+        return store
+
+    store = asyncio.run(fill())
+    assert len(store._entries) <= store.max_entries
+    assert 'in-flight' in store._entries
+    assert 'done-0' not in store._entries
+    assert 'more-19' in store._entries
+
+
+def register(client, key, **payload):
+    return client.post(AuthRoutes.user_register, headers={'Idempotency-Key': key},
+                       json={'password': PASSWORD, 're_password': PASSWORD, **payload})
+
+
+def test_a_retried_request_replays_the_first_response(client, sms):
+    first = register(client, 'register-1', phone_number='09120000020')
+    retried = register(client, 'register-1', phone_number='09120000020')
+    assert first.status_code == retried.status_code == 200, retried.text
+    assert retried.json() == first.json()
+    assert retried.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert len(sms) == 1
+
+
+def test_resending_an_activation_text_with_the_same_key_sends_one_text(client, sms):
+    register(client, 'register-2', phone_number='09120000021')
+    for _ in range(3):
+        response = client.post(AuthRoutes.user_resend_phone_activation, headers={'Idempotency-Key': 'resend-1'},
+                               json={'phone_number': '09120000021'})
+        assert response.status_code == 200, response.text
+    assert response.headers['Idempotent-Replayed'] == 'true'
+    assert len(sms) == 2
+
+
+def test_a_duplicate_of_an_in_flight_request_waits_for_its_response(client, monkeypatch):
+    sent = []
+    started, release = threading.Event(), threading.Event()
+
+    async def send_activation_email(email, token):
+        sent.append(email)
+        started.set()
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(auth, 'send_activation_email', send_activation_email)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(register, client, 'register-3', email='inflight@example.com')
+        assert started.wait(5)
+        duplicate = pool.submit(register, client, 'register-3', email='inflight@example.com')
+        time.sleep(0.2)
+        assert not duplicate.done()
+        release.set()
+        first, duplicate = first.result(timeout=5), duplicate.result(timeout=5)
+    assert first.status_code == duplicate.status_code == 200, duplicate.text
+    assert duplicate.headers['Idempotent-Replayed'] == 'true'
+    assert sent == ['inflight@example.com']
+
+
+def test_a_key_reused_for_another_request_is_rejected(client, sms):
+    register(client, 'register-4', phone_number='09120000022')
+    response = register(client, 'register-4', phone_number='09120000023')
+    assert response.status_code == 422, response.text
+    assert len(sms) == 1
+
+
+def test_server_errors_are_not_stored(client, sms, monkeypatch):
+    def overloaded(*args, **kwargs):
+        raise ServiceOverloadedException(retry_after=1)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(auth.auth_handler, 'get_password_hash', overloaded)
+        response = register(client, 'register-5', phone_number='09120000024')
+    assert response.status_code == 503, response.text
+
+    response = register(client, 'register-5', phone_number='09120000024')
+    assert response.status_code == 200, response.text
+    assert 'Idempotent-Replayed' not in response.headers
+    assert len(sms) == 1
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from sql_app import identifier_index as module
+from sql_app.identifier_index import BloomFilter, IdentifierIndex
+from sql_app.models import User
+
+
+def insert_user(engine, **values):
+    with engine.begin() as connection:
+        return connection.execute(User.__table__.insert().values(password='x', is_active=False, **values)
+                                  ).inserted_primary_key[0]
+
+
+def test_bloom_filter_has_no_false_negatives_and_counts_distinct_items():
+    bloom = BloomFilter(capacity=1000, false_positive_rate=0.01)
+    items = [f'e:user{i}@example.com' for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    assert bloom.count <= 1000
+
+    count = bloom.count
+    assert not bloom.add(items[0])
+    assert bloom.count == count
+
+    false_positives = sum(f'e:other{i}@example.com' in bloom for i in range(10_000))
+    assert false_positives < 10_000 * 0.03
+
+
+def test_miss_before_the_first_rebuild_is_maybe():
+    index = IdentifierIndex(capacity=100)
+    assert index.might_exist(email='anyone@example.com')
+
+
+def test_rebuild_and_add(engine):
+    insert_user(engine, email='Known@Example.com', phone_number='09120000000')
+    index = IdentifierIndex(capacity=100)
+    index.rebuild(engine)
+    assert index.might_exist(email=' known@example.com')
+    assert index.might_exist(phone_number='09120000000')
+    assert not index.might_exist(email='unknown@example.com')
+
+    index.add(email='new@example.com')
+    assert index.might_exist(email='new@example.com')
+
+
+def test_refresh_picks_up_users_written_by_other_workers(engine):
+    user_id = insert_user(engine, email='first@example.com')
+    index = IdentifierIndex(capacity=100, refresh_interval_seconds=5)
+    index.rebuild(engine)
+
+    insert_user(engine, email='second@example.com')
+    with engine.begin() as connection:
+        connection.execute(User.__table__.update().where(User.id == user_id)
+                           .values(phone_number='09120000001', date_updated=datetime.utcnow()))
+    assert not index.might_exist(email='second@example.com')
+    index.refresh(engine)
+    assert index.might_exist(email='second@example.com')
+    assert index.might_exist(phone_number='09120000001')
+
+
+def test_refresh_does_not_recount_rows_in_the_overlap_window(engine):
+    insert_user(engine, email='first@example.com', date_created=datetime.utcnow())
+    index = IdentifierIndex(capacity=100, refresh_interval_seconds=5)
+    index.rebuild(engine)
+    insert_user(engine, email='second@example.com', date_created=datetime.utcnow())
+    for _ in range(3):
+        assert index.refresh(engine)
+    assert index.stats()['items'] == 2
+
+
+def test_stale_filter_answers_maybe(engine, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(module.time, 'monotonic', lambda: now[0])
+    index = IdentifierIndex(capacity=100, refresh_interval_seconds=5)
+    index.rebuild(engine)
+    assert not index.might_exist(email='missing@example.com')
+
+    now[0] += 16
+    assert index.stats()['stale']
+    assert index.might_exist(email='missing@example.com')
+    index.refresh(engine)
+    assert not index.might_exist(email='missing@example.com')
@@ -0,0 +1,84 @@
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from sql_app.login_events import LoginEventBuffer, LoginOutcome
+from sql_app.models import LoginEvent, User
+from sql_app.query_stats import track_queries
+
+
+@pytest.fixture
+def buffer():
+    buffer = LoginEventBuffer(batch_size=100, flush_interval_seconds=60)
+    yield buffer
+    buffer.stop()
+
+
+def insert_users(engine, count):
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [{'password': 'x', 'is_active': True} for _ in range(count)])
+
+
+def events(engine):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(LoginEvent)).scalar_one()
+
+
+def last_logins(engine):
+    with engine.connect() as connection:
+        return dict(connection.execute(select(User.id, User.last_login)).all())
+
+
+def test_flush_writes_a_batch_in_one_statement_per_table(buffer, engine):
+    insert_users(engine, 2)
+    buffer.start(engine)
+    first = datetime.utcnow()
+    for user_id in (1, 2, 1, 1):
+        buffer.record(LoginOutcome.SUCCESS, user_id=user_id, identifier='user@example.com', ip='10.0.0.1')
+    buffer.record(LoginOutcome.INVALID_CREDENTIALS, user_id=2, identifier='user@example.com', ip='10.0.0.1')
+
+    with track_queries() as stats:
+        assert buffer.flush() == 5
+    assert stats.count == 2
+    assert events(engine) == 5
+    logins = last_logins(engine)
+    assert logins[1] >= logins[2] >= first
+
+
+def test_a_full_batch_wakes_the_writer(buffer, engine):
+    buffer.batch_size = 3
+    buffer.start(engine)
+    for _ in range(3):
+        buffer.record(LoginOutcome.UNKNOWN_USER, identifier='nobody@example.com')
+    deadline = time.monotonic() + 5
+    while events(engine) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert events(engine) == 3
+
+
+def test_events_recorded_before_start_are_kept(buffer, engine):
+    buffer.record(LoginOutcome.UNKNOWN_USER, identifier='early@example.com')
+    assert buffer.flush() == 0
+    buffer.start(engine)
+    assert buffer.flush() == 1
+    assert events(engine) == 1
+
+
+def test_stop_drains_the_buffer(buffer, engine):
+    buffer.start(engine)
+    buffer.record(LoginOutcome.THROTTLED, identifier='user@example.com')
+    buffer.stop()
+    assert events(engine) == 1
+
+
+def test_rejected_events_are_dropped_and_the_rest_written(buffer, engine):
+    buffer.start(engine)
+    buffer.record(LoginOutcome.UNKNOWN_USER, identifier='first@example.com')
+    buffer.record(None, identifier='broken@example.com')
+    buffer.record(LoginOutcome.UNKNOWN_USER, identifier='last@example.com')
+    assert buffer.flush() == 2
+    assert buffer.rejected == 1
+    assert events(engine) == 2
+    assert buffer.flush() == 0
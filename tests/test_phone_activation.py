@@ -0,0 +1,45 @@
+from sqlalchemy import select
+
+from authentication.auth import AuthRoutes, auth_handler
+from sql_app.models import User
+from tests.conftest import PASSWORD
+
+
+def test_resend_stops_at_the_phone_activation_limit(client, sms):
+    client.post(AuthRoutes.user_register, json={'phone_number': '09120000020', 'password': PASSWORD,
+                                                're_password': PASSWORD})
+    responses = [client.post(AuthRoutes.user_resend_phone_activation, json={'phone_number': '09120000020'})
+                 for _ in range(3)]
+    # PHONE_ACTIVATION_LIMIT=2 in tests: the sign-up text and one resend
+    assert [response.status_code for response in responses] == [200, 400, 400]
+    assert len(sms) == 2
+
+
+def test_wrong_codes_exhaust_the_attempt_budget(client, sms):
+    client.post(AuthRoutes.user_register, json={'phone_number': '09120000021', 'password': PASSWORD,
+                                                're_password': PASSWORD})
+    otp = sms[-1]['token']
+    wrong = otp + 1 if otp < 999999 else otp - 1
+    statuses = [client.post(AuthRoutes.user_phone_activation,
+                            json={'phone_number': '09120000021', 'otp': wrong}).status_code for _ in range(5)]
+    assert statuses == [400] * 5
+    response = client.post(AuthRoutes.user_phone_activation, json={'phone_number': '09120000021', 'otp': otp})
+    assert response.status_code == 429, response.text
+
+
+def test_a_code_for_the_old_number_does_not_verify_a_new_one(client, engine, sms):
+    client.post(AuthRoutes.user_register, json={'phone_number': '09120000022', 'password': PASSWORD,
+                                                're_password': PASSWORD})
+    otp = sms[-1]['token']
+    with engine.connect() as connection:
+        user_id = connection.execute(select(User.id).where(User.phone_number == '09120000022')).scalar_one()
+    access = auth_handler.encode_token(user_id=user_id, access_token=True)
+    response = client.patch(AuthRoutes.user_update_info, json={'old_password': PASSWORD,
+                                                                'phone_number': '09120000023'},
+                            headers={'Authorization': f'Bearer {access}'})
+    assert response.status_code == 200, response.text
+
+    response = client.post(AuthRoutes.user_phone_activation, json={'phone_number': '09120000022', 'otp': otp})
+    assert response.status_code == 400, response.text
+    with engine.connect() as connection:
+        assert connection.execute(select(User.phone_verified_at).where(User.id == user_id)).scalar() is None
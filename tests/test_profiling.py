@@ -0,0 +1,61 @@
+import threading
+import time
+
+from authentication.auth import AuthRoutes, login_events
+from authentication.profiling import RequestProfiler
+from tests.conftest import PASSWORD
+
+ADMIN = {'X-Admin-Key': 'test-admin-key'}
+
+
+def test_profile_leaves_out_background_threads(engine):
+    login_events.start(engine)
+    try:
+        profiler = RequestProfiler(routes=[AuthRoutes.user_login], interval_seconds=0.001)
+        profile = profiler.start('POST', AuthRoutes.user_login)
+        time.sleep(0.05)
+        profiler.stop(profile)
+    finally:
+        login_events.stop()
+    assert profile.samples > 0
+    assert profile.folded() == ''
+
+
+def test_stop_waits_for_the_sampler():
+    profiler = RequestProfiler(routes=[AuthRoutes.user_login], interval_seconds=0.001)
+    profile = profiler.start('POST', AuthRoutes.user_login)
+    profile.threads.add(threading.get_ident())
+    profiler.stop(profile)
+    samples = profile.samples
+    time.sleep(0.01)
+    assert profile.samples == samples
+    assert not any(thread.name == 'request-profiler' for thread in threading.enumerate())
+    second = profiler.start('POST', AuthRoutes.user_login)
+    assert second is not None
+    profiler.stop(second)
+
+
+def profile_of(client, route):
+    [summary] = [p for p in client.get(AuthRoutes.admin_profiles, headers=ADMIN).json() if p['route'] == route]
+    return client.get(AuthRoutes.admin_profile.format(profile_id=summary['id']), headers=ADMIN).text
+
+
+def test_profile_of_a_sync_handler_includes_its_worker_thread(client, create_user):
+    create_user(email='profiled@example.com')
+    response = client.post(AuthRoutes.user_login, json={'email': 'profiled@example.com', 'password': PASSWORD},
+                           headers={'X-Debug-Profile': ADMIN['X-Admin-Key']})
+    assert response.status_code == 200, response.text
+
+    folded = profile_of(client, AuthRoutes.user_login)
+    assert 'login (auth.py' in folded
+    assert 'verify_password (auth_utils.py' in folded
+    assert 'login_events.py' not in folded
+    assert 'identifier_index.py' not in folded
+
+
+def test_profile_of_an_async_handler_includes_its_hashing(client):
+    response = client.post(AuthRoutes.user_register, json={'email': 'profiled-async@example.com',
+                                                           'password': PASSWORD, 're_password': PASSWORD},
+                           headers={'X-Debug-Profile': ADMIN['X-Admin-Key']})
+    assert response.status_code == 200, response.text
+    assert 'get_password_hash (auth_utils.py' in profile_of(client, AuthRoutes.user_register)
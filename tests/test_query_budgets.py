@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+import pytest
+
+from authentication.auth import AuthRoutes, QUERY_BUDGETS, email_activation_token, signed_links
+from authentication.signed_links import SignedLinkHandler
+from sql_app.query_stats import QueryBudgetExceeded, query_budget as budget
+from tests.conftest import PASSWORD
+
+
+def login(client, email):
+    response = client.post(AuthRoutes.user_login, json={'email': email, 'password': PASSWORD})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def register_phone(client, sms, phone_number):
+    response = client.post(AuthRoutes.user_register, json={'phone_number': phone_number, 'password': PASSWORD,
+                                                            're_password': PASSWORD})
+    assert response.status_code == 200, response.text
+    return sms[-1]['token']
+
+
+def test_budget_violation_lists_statements(client, create_user):
+    create_user(email='over@example.com')
+    with pytest.raises(QueryBudgetExceeded, match=r'ran 1 queries, budget is 0:\n  1 x \[\w+\] SELECT'):
+        with budget(0, label=AuthRoutes.user_login):
+            login(client, 'over@example.com')
+
+
+def test_register(client, query_budget):
+    with query_budget(AuthRoutes.user_register):
+        response = client.post(AuthRoutes.user_register, json={'email': 'new@example.com', 'password': PASSWORD,
+                                                                're_password': PASSWORD})
+    assert response.status_code == 200, response.text
+
+
+def test_email_activation(client, create_user, query_budget):
+    token = email_activation_token(create_user(email='inactive@example.com', active=False))
+    with query_budget(AuthRoutes.user_email_activation):
+        response = client.post(AuthRoutes.user_email_activation.format(token=token))
+    assert response.status_code == 200, response.text
+
+
+def test_phone_activation(client, sms, query_budget):
+    otp = register_phone(client, sms, '09120000001')
+    with query_budget(AuthRoutes.user_phone_activation):
+        response = client.post(AuthRoutes.user_phone_activation, json={'phone_number': '09120000001', 'otp': otp})
+    assert response.status_code == 200, response.text
+
+
+def test_resend_email_activation(client, create_user, query_budget):
+    create_user(email='resend@example.com', active=False)
+    with query_budget(AuthRoutes.user_resend_email_activation):
+        response = client.post(AuthRoutes.user_resend_email_activation, json={'email': 'resend@example.com'})
+    assert response.status_code == 200, response.text
+
+
+def test_resend_phone_activation(client, sms, query_budget):
+    register_phone(client, sms, '09120000002')
+    with query_budget(AuthRoutes.user_resend_phone_activation):
+        response = client.post(AuthRoutes.user_resend_phone_activation, json={'phone_number': '09120000002'})
+    assert response.status_code == 200, response.text
+
+
+def test_login(client, create_user, query_budget):
+    create_user(email='login@example.com')
+    with query_budget(AuthRoutes.user_login):
+        login(client, 'login@example.com')
+
+
+def test_refresh_token(client, create_user, query_budget):
+    create_user(email='refresh@example.com')
+    tokens = login(client, 'refresh@example.com')
+    with query_budget(AuthRoutes.user_refresh_token):
+        response = client.post(AuthRoutes.user_refresh_token, json={'refresh': tokens['refresh']})
+    assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize('method, payload', [
+    ('patch', {'email': 'patched@example.com'}),
+    ('put', {'email': 'put@example.com', 'new_password': 'a new password'}),
+])
+def test_update_info(client, create_user, query_budget, method, payload):
+    create_user(email=f'{method}-update@example.com')
+    tokens = login(client, f'{method}-update@example.com')
+    with query_budget(AuthRoutes.user_update_info):
+        response = client.request(method, AuthRoutes.user_update_info, json={'old_password': PASSWORD, **payload},
+                                  headers={'Authorization': f'Bearer {tokens["access"]}'})
+    assert response.status_code == 200, response.text
+
+
+def test_forgot_password(client, create_user, query_budget):
+    create_user(email='forgot@example.com')
+    with query_budget(AuthRoutes.user_forgot_password):
+        response = client.post(AuthRoutes.user_forgot_password, json={'email': 'forgot@example.com'})
+    assert response.status_code == 200, response.text
+
+
+def test_reset_password(client, create_user, query_budget):
+    user = create_user(email='reset@example.com')
+    token = signed_links.create(SignedLinkHandler.RESET_PASSWORD, user, expires_in=timedelta(minutes=5))
+    with query_budget(AuthRoutes.user_reset_password):
+        response = client.post(AuthRoutes.user_reset_password.format(token=token),
+                               json={'password': 'a new password', 're_password': 'a new password'})
+    assert response.status_code == 200, response.text
+
+
+def test_every_budgeted_route_is_tested():
+    tested = {name[len('test_'):] for name in globals() if name.startswith('test_')}
+    assert {name[len('user_'):] for name, route in vars(AuthRoutes).items()
+            if route in QUERY_BUDGETS} <= tested
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+import pytest
+
+from authentication.signed_links import SignedLinkHandler
+from sql_app.user_views import UserEmailContact
+
+USER = UserEmailContact(id=1, email='user@example.com', email_verified_at=None, password='hash')
+
+
+@pytest.mark.parametrize('secret', ['', '   '])
+def test_a_secret_is_required(secret):
+    with pytest.raises(ValueError):
+        SignedLinkHandler(secret)
+
+
+def test_links_signed_with_another_secret_are_rejected():
+    token = SignedLinkHandler('other-secret').create(SignedLinkHandler.RESET_PASSWORD, USER,
+                                                     expires_in=timedelta(minutes=5))
+    assert SignedLinkHandler('test-secret').verify(token, SignedLinkHandler.RESET_PASSWORD) is None
+
+
+def test_reset_link_stops_matching_once_the_password_changes():
+    links = SignedLinkHandler('test-secret')
+    token = links.create(SignedLinkHandler.RESET_PASSWORD, USER, expires_in=timedelta(minutes=5))
+    claims = links.verify(token, SignedLinkHandler.RESET_PASSWORD)
+    assert claims and not claims.expired
+    assert links.matches(claims, USER)
+    assert not links.matches(claims, USER._replace(password='new hash'))
+    assert links.verify(token, SignedLinkHandler.EMAIL_ACTIVATION) is None
@@ -0,0 +1,96 @@
+import pytest
+
+from authentication import auth, throttle
+from authentication.auth import AuthRoutes
+from authentication.error_responses import TooManyLoginAttemptsException
+from authentication.throttle import LoginThrottle
+from sql_app.query_stats import query_budget as budget
+from tests.conftest import PASSWORD
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(throttle.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def login_throttle(monkeypatch):
+    login_throttle = LoginThrottle(free_attempts=3, ip_free_attempts=5, base_lockout_seconds=1,
+                                   max_lockout_seconds=8)
+    monkeypatch.setattr(auth, 'login_throttle', login_throttle)
+    return login_throttle
+
+
+def retry_after(login_throttle, account=None, ip=None):
+    with pytest.raises(TooManyLoginAttemptsException) as raised:
+        login_throttle.check(account, ip)
+    return raised.value.retry_after
+
+
+def test_account_is_locked_out_after_its_free_attempts(login_throttle, clock):
+    for _ in range(3):
+        login_throttle.record_failure('user@example.com', None)
+        login_throttle.check('user@example.com', None)
+    login_throttle.record_failure('user@example.com', None)
+    assert retry_after(login_throttle, account='user@example.com') == 1
+    login_throttle.check('other@example.com', None)
+
+
+def test_lockout_doubles_up_to_its_cap(login_throttle, clock):
+    lockouts = []
+    for _ in range(3 + 6):
+        login_throttle.record_failure('user@example.com', None)
+        try:
+            login_throttle.check('user@example.com', None)
+        except TooManyLoginAttemptsException as e:
+            lockouts.append(e.retry_after)
+            clock.now += e.retry_after
+    assert lockouts == [1, 2, 4, 8, 8, 8]
+
+
+def test_lockout_expires(login_throttle, clock):
+    for _ in range(4):
+        login_throttle.record_failure('user@example.com', None)
+    clock.now += 1
+    login_throttle.check('user@example.com', None)
+
+
+def test_ip_is_locked_out_across_accounts(login_throttle, clock):
+    for i in range(5):
+        login_throttle.record_failure(f'user{i}@example.com', '10.0.0.1')
+    login_throttle.check('user5@example.com', '10.0.0.1')
+    login_throttle.record_failure('user5@example.com', '10.0.0.1')
+    assert retry_after(login_throttle, account='user6@example.com', ip='10.0.0.1') == 1
+    login_throttle.check('user6@example.com', '10.0.0.2')
+
+
+def test_success_clears_the_account_but_not_the_ip(login_throttle, clock):
+    for _ in range(3):
+        login_throttle.record_failure('user@example.com', '10.0.0.1')
+    login_throttle.record_success('user@example.com')
+    login_throttle.record_failure('user@example.com', '10.0.0.1')
+    login_throttle.check('user@example.com', '10.0.0.1')
+    assert login_throttle.stats()['tracked_accounts'] == 1
+    assert login_throttle.stats()['tracked_ips'] == 1
+
+
+def test_throttled_login_is_rejected_before_any_query(client, create_user, login_throttle, clock):
+    create_user(email='locked@example.com')
+    for _ in range(4):
+        response = client.post(AuthRoutes.user_login, json={'email': 'locked@example.com', 'password': 'wrong'})
+        assert response.status_code == 400, response.text
+    with budget(0, label=AuthRoutes.user_login):
+        response = client.post(AuthRoutes.user_login, json={'email': 'locked@example.com', 'password': PASSWORD})
+    assert response.status_code == 429, response.text
+    assert response.headers['Retry-After'] == '1'
+    assert login_throttle.stats()['throttled_total'] == 1
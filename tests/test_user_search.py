@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from authentication.auth import AuthRoutes
+from sql_app.models import User
+from sql_app.query_stats import track_queries
+from sql_app.user_search import search_statement, search_users
+
+ADMIN = {'X-Admin-Key': 'test-admin-key'}
+
+
+def test_admin_search_pages_through_users_without_date_created(client, engine):
+    created = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'email': f'user{i}@example.com', 'password': 'x', 'is_active': False,
+             'date_created': None if i % 3 == 0 else created + timedelta(days=i % 2)}
+            for i in range(10)
+        ])
+
+    ids, cursor = [], None
+    while True:
+        response = client.get(AuthRoutes.admin_users, params={'limit': 2, **({'cursor': cursor} if cursor else {})},
+                              headers=ADMIN)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        ids += [item['id'] for item in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert sorted(ids) == list(range(1, 11))
+    assert ids[-4:] == [1, 4, 7, 10]
+
+
+def test_each_page_query_is_a_single_range(db, engine):
+    created = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'email': f'user{i}@example.com', 'password': 'x', 'is_active': False,
+             'date_created': None if i >= 3 else created + timedelta(days=i)}
+            for i in range(6)
+        ])
+
+    pages, cursor = [], None
+    with track_queries() as stats:
+        while True:
+            rows, cursor = search_users(db, search_statement(email_verified=False), cursor=cursor, limit=2)
+            pages.append([row.id for row in rows])
+            if not cursor:
+                break
+    assert pages == [[1, 2], [3, 4], [5, 6]]
+    assert not any(' OR ' in statement for statement in stats.statements.values())